@@ -0,0 +1,164 @@
+# batch.py — 複数リーグを並列に回すバッチ実行（UI 不要）
+# ------------------------------------------------------------
+#   python batch.py --leagues 16 --seasons 5 --jobs 8 --seed 0 --out runs/base
+#   python batch.py --set 'STYLE_MULT={"counter": [1.10, 1.12]}' --out runs/counter
+#
+# 各リーグは独立したプロセスで new_game → play_week を回す（乱数は SeedSequence.spawn の子）。
+# 出力（--out 以下）:
+#   goals.csv     1試合・片側あたり得点の分布（ホーム / アウェイ / 合計）
+#   tables.csv    各シーズンの最終順位表
+#   budget.csv    ユーザークラブの予算推移（週ごと）
+#   ov_curves.csv シーズン末の年齢 × 成長タイプ別 OV（人数・平均・標準偏差）
+#   summary.json  引数・シード・所要時間・試合結果の要約
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import engine
+from engine import make_league_config, new_game, play_week, season_weeks
+
+
+def _apply_overrides(overrides:dict):
+    """engine のバランス定数を上書き（dict 同士は update、それ以外は置き換え）"""
+    for name, value in overrides.items():
+        if not hasattr(engine, name):
+            raise ValueError(f"engine has no constant {name!r}")
+        cur = getattr(engine, name)
+        if isinstance(cur, dict) and isinstance(value, dict):
+            value = {**cur, **value}
+        setattr(engine, name, value)
+
+
+def run_league(league:int, seed:np.random.SeedSequence, seasons:int,
+               config:Optional[dict]=None, overrides:Optional[dict]=None) -> dict:
+    """1リーグを seasons シーズン回して集計用のレコードを返す（ワーカープロセスで実行）"""
+    _apply_overrides(overrides or {})
+    t0 = time.perf_counter()
+    D = new_game(config, seed)
+    goals = []; tables = []; budget = []; ov = []
+    last = D["season"] + seasons - 1
+    while D["season"] <= last:
+        season, week = D["season"], D["week"]
+        # 昇降格で順位表が差し替わる前に最終節の表を押さえておく
+        final = dict(D["standings"]) if week == season_weeks(D) else None
+        for r in play_week(D):
+            goals.append((r["gh"], r["ga"]))
+        budget.append((league, season, week, int(D["budget"])))
+        if final is not None:
+            for div, tbl in final.items():
+                df = tbl.frame(sort=True).reset_index()
+                df.insert(0, "Rank", np.arange(1, len(df) + 1))
+                df.insert(0, "Div", div); df.insert(0, "Season", season); df.insert(0, "League", league)
+                tables.append(df)
+            pl = D["players"]
+            g = pl["OV"].astype(float).groupby([pl["Age"].astype(int), pl["Growth"]]).agg(["count", "mean", "std"])
+            g = g.reset_index().rename(columns={"count": "N", "mean": "OV", "std": "OV_sd"})
+            g.insert(0, "Season", season); g.insert(0, "League", league)
+            ov.append(g)
+    return {
+        "league": league,
+        "goals": np.array(goals, dtype=np.int64).reshape(-1, 2),
+        "tables": pd.concat(tables, ignore_index=True),
+        "budget": pd.DataFrame(budget, columns=["League", "Season", "Week", "Budget"]),
+        "ov": pd.concat(ov, ignore_index=True),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def goal_distribution(goals:np.ndarray) -> pd.DataFrame:
+    """(gh, ga) の配列 → 得点数ごとの試合数（home / away / total）"""
+    n = int(goals.sum(axis=1).max()) + 1 if len(goals) else 1
+    return pd.DataFrame({
+        "home": np.bincount(goals[:, 0], minlength=n),
+        "away": np.bincount(goals[:, 1], minlength=n),
+        "total": np.bincount(goals.sum(axis=1), minlength=n),
+    }, index=pd.RangeIndex(n, name="goals"))
+
+
+def run_batch(leagues:int, seasons:int, seed:Optional[int]=None, jobs:Optional[int]=None,
+              config:Optional[dict]=None, overrides:Optional[dict]=None) -> dict:
+    """leagues 本のリーグを jobs プロセスで並列に回して結果をまとめる"""
+    ss = np.random.SeedSequence(seed)
+    children = ss.spawn(leagues)
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = [ex.submit(run_league, i, child, seasons, config, overrides) for i, child in enumerate(children)]
+        runs = [f.result() for f in futures]
+    goals = np.concatenate([r["goals"] for r in runs])
+    gh, ga = goals[:, 0], goals[:, 1]
+    summary = {
+        "leagues": leagues, "seasons": seasons, "jobs": jobs or os.cpu_count(),
+        "seed_entropy": str(ss.entropy), "config": config, "overrides": overrides or {},
+        "seconds": time.perf_counter() - t0,
+        "league_seconds": [round(r["seconds"], 3) for r in runs],
+        "matches": int(len(goals)),
+        "goals_per_match": float((gh + ga).mean()) if len(goals) else 0.0,
+        "home_win": float((gh > ga).mean()) if len(goals) else 0.0,
+        "draw": float((gh == ga).mean()) if len(goals) else 0.0,
+        "away_win": float((gh < ga).mean()) if len(goals) else 0.0,
+    }
+    return {
+        "goals": goal_distribution(goals),
+        "tables": pd.concat([r["tables"] for r in runs], ignore_index=True),
+        "budget": pd.concat([r["budget"] for r in runs], ignore_index=True),
+        "ov_curves": pd.concat([r["ov"] for r in runs], ignore_index=True),
+        "summary": summary,
+    }
+
+
+def write_outputs(out:str, res:dict):
+    os.makedirs(out, exist_ok=True)
+    res["goals"].to_csv(os.path.join(out, "goals.csv"))
+    for name in ("tables", "budget", "ov_curves"):
+        res[name].to_csv(os.path.join(out, f"{name}.csv"), index=False)
+    with open(os.path.join(out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(res["summary"], f, ensure_ascii=False, indent=2)
+
+
+def _parse_set(items:list) -> dict:
+    out = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--set expects NAME=JSON, got {item!r}")
+        out[name.strip()] = json.loads(value)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run independent leagues in parallel and write aggregate outputs.")
+    ap.add_argument("--leagues", type=int, default=8, help="number of independent leagues (K)")
+    ap.add_argument("--seasons", type=int, default=3, help="seasons per league (S)")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--seed", type=int, default=None, help="root seed (default: fresh entropy, recorded in summary.json)")
+    ap.add_argument("--out", default="runs/latest", help="output directory")
+    ap.add_argument("--divisions", type=int, default=None)
+    ap.add_argument("--clubs-per-division", type=int, default=None)
+    ap.add_argument("--squad-size", type=int, default=None)
+    ap.add_argument("--promotion-slots", type=int, default=None)
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=JSON",
+                    help="override an engine balance constant, e.g. 'GROWTH_PEAK={\"標準\": 26}'")
+    args = ap.parse_args(argv)
+
+    shape = {k: v for k, v in (("divisions", args.divisions), ("clubs_per_division", args.clubs_per_division),
+                               ("squad_size", args.squad_size), ("promotion_slots", args.promotion_slots))
+             if v is not None}
+    config = make_league_config(**shape)
+    overrides = _parse_set(args.set)
+    _apply_overrides(overrides)    # 名前の誤りはワーカー起動前に弾く
+    res = run_batch(args.leagues, args.seasons, args.seed, args.jobs, config, overrides)
+    write_outputs(args.out, res)
+    s = res["summary"]
+    print(f"{s['leagues']} leagues x {s['seasons']} seasons on {s['jobs']} workers: {s['seconds']:.1f}s "
+          f"({s['matches']} matches, {s['goals_per_match']:.2f} goals/match) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
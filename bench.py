@@ -0,0 +1,205 @@
+# bench.py — 週処理・シーズン終了・UI 再実行のベンチマーク
+# ------------------------------------------------------------
+#   python bench.py                       # 16 / 160 / 1,600 クラブで計測 → bench_results.json
+#   python bench.py --save-baseline       # 結果を bench_baseline.json に保存
+#   python bench.py --sizes 16,160        # 以降は baseline と比較し、遅くなった項目を表示（終了コード 1）
+#                                         # baseline が無いときは警告して終了コード 2
+#
+# UI はタブごとに選択した状態で app.py を再実行する（選択中のタブだけが描画される）。
+#
+# play_week のサブステージは D.profiler（state.StageProfiler）の記録をそのまま使う。
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+import engine
+from engine import make_league_config, season_weeks
+
+# 世界の大きさ（クラブ数 → make_league_config の引数）
+SIZES = {
+    16: {},
+    160: {"divisions": 8, "clubs_per_division": 20},
+    1600: {"divisions": 80, "clubs_per_division": 20},
+}
+
+# シーズン終了週だけ走るステージ（D.profiler のステージ名）
+SEASON_END_STAGES = ("season_end_sponsors", "promote_relegate", "continental_groups", "youth_intake")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def _ms(t0:float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+def bench_engine(clubs:int, weeks:int, seed:int=0) -> tuple:
+    """(結果 dict, ゲーム状態) — 初期化・通常週（ステージ別の中央値）・シーズン終了週"""
+    cfg = make_league_config(**SIZES[clubs])
+    out = {"config": cfg}
+    t0 = time.perf_counter()
+    D = engine.init_session(cfg, seed)
+    out["init_session_ms"] = _ms(t0)
+    t0 = time.perf_counter()
+    engine.init_league(D)
+    out["init_league_ms"] = _ms(t0)
+    t0 = time.perf_counter()
+    engine.prepare_state(D)
+    out["prepare_state_ms"] = _ms(t0)
+    out["players"] = int(len(D["players"]))
+    out["players_kb"] = float(D["players"].memory_usage(deep=True).sum() / 1024)
+
+    n_weeks = season_weeks(D)
+    engine.play_week(D)                     # ウォームアップ（初回のキャッシュ構築）
+    per_stage = {}
+    for _ in range(min(weeks, n_weeks - D["week"])):
+        engine.play_week(D)
+        w = D.profiler.last()
+        for name, v in w["stages"].items():
+            per_stage.setdefault(name, []).append(v["ms"])
+        per_stage.setdefault("other", []).append(w["total_ms"] - sum(v["ms"] for v in w["stages"].values()))
+        per_stage.setdefault("total", []).append(w["total_ms"])
+    out["week_ms"] = {name: statistics.median(v) for name, v in per_stage.items()}
+
+    while D["week"] < n_weeks:
+        engine.play_week(D)
+    engine.play_week(D)
+    w = D.profiler.last()
+    out["season_end_ms"] = {name: w["stages"][name]["ms"] for name in SEASON_END_STAGES}
+    out["season_end_ms"]["total"] = w["total_ms"]
+    return out, D
+
+
+def bench_ui(D, reruns:int) -> dict:
+    """AppTest でタブごとに app.py を再実行した時間（選択中のタブだけ描画される）と、タブ本体の描画時間"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state["data"] = D
+    at.run()                                # 初回（スクリプトのコンパイル込み）は除外
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {[e.value for e in at.exception]}")
+    labels = [tb.label for tb in at.tabs]
+    runs, tabs = {}, {}
+    for label in labels:
+        at.session_state["active_tab"] = label
+        at.run()                            # タブ切り替え直後（キャッシュが温まる前）は除外
+        for _ in range(reruns):
+            at.session_state["tab_ms"] = {}     # 1回の実行で描画されたタブだけ残す
+            t0 = time.perf_counter()
+            at.run()
+            ms = _ms(t0)
+            if at.exception:
+                raise RuntimeError(f"app.py raised on {label!r}: {[e.value for e in at.exception]}")
+            for name, v in at.session_state["tab_ms"].items():
+                runs.setdefault(name, []).append(ms)
+                tabs.setdefault(name, []).append(v)
+    return {"rerun_ms": {name: statistics.median(v) for name, v in runs.items()},
+            "tab_ms": {name: statistics.median(v) for name, v in tabs.items()}}
+
+
+def run(sizes:List[int], weeks:int, ui_reruns:int, seed:int=0) -> dict:
+    res = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpu_count": os.cpu_count(),
+            "weeks": weeks, "ui_reruns": ui_reruns, "seed": seed,
+        },
+        "sizes": {},
+    }
+    for clubs in sizes:
+        print(f"[{clubs} clubs] engine ...", file=sys.stderr)
+        r, D = bench_engine(clubs, weeks, seed)
+        if ui_reruns:
+            print(f"[{clubs} clubs] ui ...", file=sys.stderr)
+            r["ui"] = bench_ui(D, ui_reruns)
+        res["sizes"][str(clubs)] = r
+    return res
+
+
+def flatten(res:dict) -> Dict[str, float]:
+    """比較用に 'サイズ/区分/項目' → ms の平坦な dict にする"""
+    out = {}
+    def walk(prefix, node):
+        for k, v in node.items():
+            if isinstance(v, dict):
+                walk(f"{prefix}/{k}", v)
+            elif k.endswith("_ms") or prefix.endswith("_ms"):
+                out[f"{prefix}/{k}"] = float(v)
+    for size, r in res["sizes"].items():
+        walk(size, {k: v for k, v in r.items() if k != "config"})
+    return out
+
+
+def compare(res:dict, base:dict, tolerance:float, floor_ms:float) -> List[tuple]:
+    """baseline より tolerance 以上かつ floor_ms 以上遅くなった項目 [(key, base, now)]"""
+    cur, old = flatten(res), flatten(base)
+    return [(k, old[k], v) for k, v in cur.items()
+            if k in old and v > old[k] * (1 + tolerance) and v - old[k] > floor_ms]
+
+
+def print_report(res:dict):
+    for size, r in res["sizes"].items():
+        print(f"== {size} clubs ({r['players']} players, {r['players_kb']:,.0f} KB)")
+        print(f"  init_session {r['init_session_ms']:.1f} ms / init_league {r['init_league_ms']:.1f} ms"
+              f" / prepare_state {r['prepare_state_ms']:.1f} ms")
+        print("  week  " + "  ".join(f"{k} {v:.1f}" for k, v in r["week_ms"].items()))
+        print("  end   " + "  ".join(f"{k} {v:.1f}" for k, v in r["season_end_ms"].items()))
+        if "ui" in r:
+            print("  ui    " + "  ".join(f"{k} {v:.1f}/{r['ui']['tab_ms'][k]:.1f}" for k, v in r["ui"]["rerun_ms"].items())
+                  + "  (rerun/tab ms)")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the weekly tick, season rollover and UI reruns.")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help=f"comma-separated club counts ({', '.join(map(str, SIZES))})")
+    ap.add_argument("--weeks", type=int, default=10, help="regular weeks timed per size (median is reported)")
+    ap.add_argument("--ui-reruns", type=int, default=3, help="AppTest reruns per size (0 = skip the UI)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default="bench_baseline.json")
+    ap.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = +25%%)")
+    ap.add_argument("--floor-ms", type=float, default=1.0, help="ignore differences smaller than this")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        ap.error(f"unknown size(s) {unknown}; choose from {list(SIZES)}")
+    res = run(sizes, args.weeks, args.ui_reruns, args.seed)
+    print_report(res)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        # 比較なしで「成功」に見えないよう、警告して別の終了コードを返す
+        print(f"WARNING: no baseline at {args.baseline}; nothing was compared. "
+              f"Run once with --save-baseline on this machine first.", file=sys.stderr)
+        return 2
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    slower = compare(res, base, args.tolerance, args.floor_ms)
+    if not slower:
+        print(f"no regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"REGRESSIONS vs {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for key, old, new in slower:
+        print(f"  {key}: {old:.1f} -> {new:.1f} ms ({new/old - 1:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
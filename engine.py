@@ -0,0 +1,1665 @@
+# engine.py — Headless simulation engine (no Streamlit)
+# ------------------------------------------------------------
+# すべての関数は GameState（D）を明示的に受け取る。
+# UI（app.py）はこのモジュールを呼ぶだけの薄いアダプタ。
+
+import pandas as pd
+import numpy as np
+from typing import List, Optional, Dict, Tuple
+
+from state import GameState, KnowledgeStore, LeagueTable
+
+# -----------------------
+# Global Constants
+# -----------------------
+USER_CLUB = "Your FC"
+CPU_CLUBS = [
+    "Northbridge United", "Riverton City", "Highland Rovers", "Blueport FC",
+    "Kingsfield Athletic", "Westvale Rangers", "Ironlake Wolves", "Sunshore Stars",
+    "Oldbury Titans", "Eagleview Jets", "Crystal Comets", "Maple Mariners",
+    "Emerald Knights", "Aurora Sparks", "Grand Valley Hearts"
+]
+POSITIONS = ["GK","CB","LB","RB","DM","CM","AM","LW","RW","ST"]
+
+# -----------------------
+# League Config（ディビジョン数・クラブ数・入れ替え枠）
+# -----------------------
+DEFAULT_LEAGUE = {
+    "divisions": 2,                 # D1 が最上位
+    "clubs_per_division": 8,        # 偶数（二回戦総当たり → 2*(n-1) 週）
+    "promotion_slots": 2,           # 境界ごとの入れ替え枠（int は全境界共通、list は上の境界から順）
+    "squad_size": 22,
+    "continental_divisions": 2,     # 大陸大会の出場候補になる上位ディビジョン数
+}
+CC_TEAMS = 16                       # 大陸大会（4組 × 4クラブ）
+
+def make_league_config(**overrides) -> dict:
+    """DEFAULT_LEAGUE を上書きした設定（promotion_slots は境界ごとの list に正規化）"""
+    cfg = dict(DEFAULT_LEAGUE, **overrides)
+    n, m = int(cfg["divisions"]), int(cfg["clubs_per_division"])
+    if n < 1 or m < 2 or m % 2:
+        raise ValueError("clubs_per_division must be an even number >= 2")
+    if n * m < CC_TEAMS:
+        raise ValueError(f"the continental cup needs at least {CC_TEAMS} clubs")
+    if 2 * (m - 1) < CC_WEEK_FINAL:
+        raise ValueError(f"a season must last at least {CC_WEEK_FINAL} weeks for the continental cup")
+    slots = cfg["promotion_slots"]
+    slots = [int(slots)] * (n - 1) if np.isscalar(slots) else [int(k) for k in slots]
+    if len(slots) != n - 1:
+        raise ValueError("promotion_slots needs one entry per division boundary")
+    if any(k < 0 for k in slots):
+        raise ValueError("promotion_slots must be >= 0")
+    for i in range(n):
+        moving = (slots[i-1] if i > 0 else 0) + (slots[i] if i < n - 1 else 0)
+        if moving > m:
+            raise ValueError(f"promotion_slots move more than {m} clubs out of D{i+1}")
+    cfg.update(divisions=n, clubs_per_division=m, promotion_slots=slots, squad_size=int(cfg["squad_size"]))
+    return cfg
+
+def league_config(D:GameState) -> dict:
+    if "league_config" not in D:
+        D["league_config"] = make_league_config()
+    return D["league_config"]
+
+def division_names(cfg:dict) -> List[str]:
+    return [f"D{i+1}" for i in range(cfg["divisions"])]
+
+def division_slots(D:GameState, d_i:int) -> Tuple[int, int]:
+    """d_i 番目（0=最上位）のディビジョンの (昇格枠, 降格枠)"""
+    slots = league_config(D)["promotion_slots"]
+    return (slots[d_i-1] if d_i > 0 else 0), (slots[d_i] if d_i < len(slots) else 0)
+
+def season_weeks(D:GameState) -> int:
+    return 2 * (league_config(D)["clubs_per_division"] - 1)
+
+def league_clubs(cfg:dict, rng:np.random.Generator) -> List[str]:
+    """リーグ全体のクラブ（ユーザー + CPU_CLUBS、足りない分は生成名）"""
+    base = [USER_CLUB] + CPU_CLUBS
+    total = cfg["divisions"] * cfg["clubs_per_division"]
+    if len(base) < total:
+        base += _make_extra_club_names(rng, total - len(base))
+    return base[:total]
+
+def cpu_clubs(D:GameState) -> List[str]:
+    return [c for c in D["club_meta"] if c != USER_CLUB]
+
+def club_division(D:GameState, club:str) -> Optional[str]:
+    """クラブの所属ディビジョン（昇降格で更新）"""
+    where = D.cached("club_division", D.version("divisions"),
+                     lambda: {c: d for d, cs in D["divisions"].items() for c in cs})
+    return where.get(club)
+
+# -----------------------
+# Utility / Finance Log
+# -----------------------
+def log_finance(D:GameState, amount:int, memo:str):
+    D.setdefault("finance_log", [])
+    D["finance_log"].append({
+        "season": D["season"], "week": D["week"], "amount": int(amount), "memo": str(memo)
+    })
+
+def next_player_id(D:GameState) -> int:
+    D["next_player_id"] += 1
+    return int(D["next_player_id"])
+
+def mv_from_ov_strict(ov:int) -> int:
+    v = int((ov**2) * 1000 / 12)
+    return (v // 5000) * 5000
+
+def mv_from_ov_array(ov:np.ndarray) -> np.ndarray:
+    v = (np.asarray(ov, dtype=np.int64)**2 * 1000 / 12).astype(np.int64)
+    return (v // 5000) * 5000
+
+# -----------------------
+# Names（各国）
+# -----------------------
+NAME_DB = {
+    "ENG": (["Smith","Johnson","Brown","Taylor","Wilson","Evans","King","Wright","Walker","Harris"],
+            ["Jack","Oliver","Harry","George","Leo","Oscar","Noah","Jacob","James","Thomas"]),
+    "ESP": (["Garcia","Martinez","Lopez","Sanchez","Perez","Gomez","Fernandez","Diaz","Hernandez","Ruiz"],
+            ["Javier","Carlos","Miguel","Diego","Luis","Sergio","Raul","Pablo","Alvaro","Antonio"]),
+    "ITA": (["Rossi","Russo","Ferrari","Esposito","Bianchi","Romano","Colombo","Ricci","Marino","Greco"],
+            ["Luca","Marco","Andrea","Giuseppe","Matteo","Francesco","Davide","Stefano","Alessandro","Antonio"]),
+    "GER": (["Muller","Schmidt","Schneider","Fischer","Weber","Wagner","Becker","Hoffmann","Koch","Schultz"],
+            ["Lukas","Leon","Finn","Ben","Jonas","Paul","Felix","Noah","Tim","Maximilian"]),
+    "FRA": (["Martin","Bernard","Dubois","Durand","Lefevre","Moreau","Girard","Renard","Fontaine","Chevalier"],
+            ["Lucas","Hugo","Nathan","Louis","Jules","Theo","Mathis","Noah","Ethan","Antoine"]),
+    "NED": (["de Jong","van Dijk","de Boer","Bakker","Visser","Smit","Mulder","Kok","Bos","Meijer"],
+            ["Daan","Sem","Levi","Bram","Lucas","Milan","Finn","Lars","Thijs","Max"]),
+    "POR": (["Silva","Santos","Ferreira","Pereira","Oliveira","Gomes","Costa","Rodrigues","Martins","Sousa"],
+            ["Joao","Miguel","Tiago","Rafael","Diogo","Andre","Bruno","Goncalo","Pedro","Ricardo"]),
+    "BEL": (["Peeters","Janssens","Dubois","Willems","Maes","Jacobs","Goossens","Leroy","Michiels","Dupont"],
+            ["Liam","Noah","Arthur","Louis","Jules","Lucas","Mohamed","Milan","Victor","Adam"]),
+    "CRO": (["Kovacic","Perisic","Brozovic","Petrovic","Kovacevic","Ilic","Jovic","Ivanovic","Maric","Babin"],
+            ["Ivan","Luka","Marko","Ante","Nikola","Mateo","Mario","Josip","Stipe","Domagoj"]),
+    "SUI": (["Meyer","Muller","Weber","Schmid","Keller","Huber","Fischer","Zimmermann","Baumann","Graf"],
+            ["Lars","Noah","Leon","Luca","Nico","Jan","Timo","Joel","Jonas","Fabian"]),
+    "TUR": (["Yilmaz","Demir","Sahin","Celik","Arslan","Kaya","Aydin","Yildiz","Ozturk","Kurt"],
+            ["Burak","Emre","Mehmet","Can","Yusuf","Mert","Cenk","Hakan","Ozan","Oguz"]),
+    "RUS": (["Ivanov","Smirnov","Kuznetsov","Popov","Vasiliev","Sokolov","Mikhailov","Fedorov","Morozov","Volkov"],
+            ["Dmitri","Sergei","Alexei","Ivan","Nikolai","Maksim","Andrei","Pavel","Viktor","Yuri"]),
+    "BRA": (["Silva","Souza","Oliveira","Santos","Lima","Costa","Pereira","Goncalves","Rodrigues","Almeida"],
+            ["Lucas","Gabriel","Arthur","Rafael","Pedro","Bruno","Thiago","Felipe","Caio","Joao"]),
+    "ARG": (["Gonzalez","Rodriguez","Lopez","Martinez","Perez","Sanchez","Diaz","Fernandez","Gomez","Romero"],
+            ["Juan","Matias","Nicolas","Santiago","Luciano","Agustin","Joaquin","Franco","Facundo","Bruno"]),
+    "URU": (["Suarez","Nunez","Cavani","Gomez","Rodriguez","Pereira","Gonzalez","Fernandez","Lopez","Sanchez"],
+            ["Carlos","Diego","Luis","Martin","Maxi","Lucas","Pablo","Sebastian","Matias","Bruno"]),
+    "USA": (["Johnson","Williams","Jones","Brown","Davis","Miller","Wilson","Moore","Taylor","Anderson"],
+            ["Liam","Noah","Elijah","James","William","Benjamin","Lucas","Henry","Alexander","Michael"]),
+    "CAN": (["Smith","Martin","Brown","Tremblay","Roy","Wilson","Campbell","Lee","Anderson","Taylor"],
+            ["Liam","Jackson","Noah","Logan","Lucas","William","Benjamin","Oliver","Ethan","Leo"]),
+    "MEX": (["Hernandez","Garcia","Martinez","Lopez","Gonzalez","Perez","Sanchez","Ramirez","Cruz","Flores"],
+            ["Jose","Juan","Luis","Carlos","Jorge","Miguel","Angel","Diego","Alejandro","Eduardo"]),
+    "JPN": (["佐藤","鈴木","高橋","田中","伊藤","渡辺","山本","中村","小林","加藤"],
+            ["太一","蓮","陽翔","蒼","大和","湊","樹","海斗","颯","朝陽"]),
+    "KOR": (["Kim","Lee","Park","Choi","Jung","Cho","Kang","Yoon","Jang","Lim"],
+            ["Minjae","Jisoo","Seungwoo","Taeyang","Jimin","Hyunwoo","Jaemin","Donghyun","Joon","Yong"]),
+    "CHN": (["Wang","Li","Zhang","Liu","Chen","Yang","Zhao","Huang","Zhou","Wu"],
+            ["Wei","Jun","Ming","Tao","Lei","Qiang","Bo","Hao","Jian","Feng"]),
+    "AUS": (["Smith","Jones","Williams","Brown","Taylor","Wilson","White","Martin","Anderson","Thompson"],
+            ["Jack","Noah","William","James","Henry","Lucas","Thomas","Charlie","Leo","Harrison"]),
+    "EGY": (["Hassan","Hussein","Mahmoud","Ibrahim","Ali","Youssef","Khaled","Mostafa","Ahmed","Said"],
+            ["Omar","Ahmed","Youssef","Mostafa","Ali","Mahmoud","Kareem","Hassan","Ibrahim","Amr"]),
+    "GHA": (["Mensah","Owusu","Appiah","Boateng","Asamoah","Osei","Addo","Ankrah","Baah","Amankwah"],
+            ["Kwame","Kofi","Yaw","Kojo","Kwesi","Yawson","Michael","Joseph","Daniel","Samuel"]),
+    "NGA": (["Okafor","Balogun","Ogunleye","Ibrahim","Muhammad","Ojo","Okeke","Abiola","Lawal","Adebayo"],
+            ["Emeka","Chinedu","Oluwaseun","Ayodele","Ifeanyi","Tobi","Kelechi","Sodiq","Samuel","Daniel"]),
+}
+NATION_POOL = list(NAME_DB.keys())
+
+def _pick(rng:np.random.Generator, seq):
+    """random.choice 相当（要素の型はそのまま）"""
+    return seq[int(rng.integers(len(seq)))]
+
+def pick_name(rng:np.random.Generator, nat: Optional[str]=None) -> str:
+    nat = nat or _pick(rng, NATION_POOL)
+    last, first = NAME_DB.get(nat, NAME_DB["ENG"])
+    # 東アジアは 姓 名 表記っぽく
+    if nat in ("JPN","KOR","CHN"):
+        return f"{_pick(rng, last)} {_pick(rng, first)}"
+    return f"{_pick(rng, first)} {_pick(rng, last)}"
+
+# -----------------------
+# Player Generation
+# -----------------------
+GROWTH_TYPES = ["早熟","標準","晩成"]
+
+def generate_player(rng:np.random.Generator, pid:int, club:Optional[str], nat: Optional[str]=None) -> dict:
+    ov = int(rng.integers(58, 83))
+    pot= min(99, ov + int(rng.integers(5, 21)))
+    pos= _pick(rng, POSITIONS)
+    age= int(rng.integers(17, 34))
+    growth = _pick(rng, GROWTH_TYPES)
+    nat = nat or _pick(rng, NATION_POOL)
+    spd = max(30, min(99, int(rng.normal(ov, 8))))
+    dfn = max(30, min(99, int(rng.normal(ov, 8))))
+    fin = max(30, min(99, int(rng.normal(ov, 8))))
+    morale = int(rng.integers(50, 76))
+    return {
+        "ID": pid,
+        "Name": pick_name(rng, nat),
+        "Pos": pos,
+        "OV": ov,
+        "POT": pot,
+        "Age": age,
+        "Club": club,
+        "MV": mv_from_ov_strict(ov),
+        "Apps": 0,
+        "Goals": 0,
+        "OnLoan": False,
+        "LoanFrom": None,
+        "LoanAppearances": 0,
+        "Growth": growth,
+        "SPD": spd, "DEF": dfn, "FIN": fin,
+        "PosRoles": [pos],
+        "Nat": nat,
+        "HGYearsClub": int(rng.integers(0, 7)) if club == USER_CLUB else 0,
+        "Morale": morale
+    }
+
+PLAYER_COLS = ["ID","Name","Pos","OV","POT","Age","Club","MV","Apps","Goals","OnLoan","LoanFrom","LoanAppearances",
+               "Growth","SPD","DEF","FIN","PosRoles","Nat","HGYearsClub","Morale"]
+
+# 一括生成用の名前プール（国籍 → (姓, 名) の配列）
+_NAME_ARRAYS = {nat: (np.array(last, dtype=object), np.array(first, dtype=object)) for nat, (last, first) in NAME_DB.items()}
+
+def pick_names(rng:np.random.Generator, nats:np.ndarray) -> np.ndarray:
+    """pick_name の配列版（国籍ごとに姓・名の添字をまとめて引く）"""
+    out = np.empty(len(nats), dtype=object)
+    codes, uniq = pd.factorize(np.asarray(nats, dtype=object))
+    for k, nat in enumerate(uniq):
+        idx = np.flatnonzero(codes == k)
+        last, first = _NAME_ARRAYS.get(nat, _NAME_ARRAYS["ENG"])
+        l = last[rng.integers(0, len(last), len(idx))]
+        f = first[rng.integers(0, len(first), len(idx))]
+        # 東アジアは 姓 名 表記
+        out[idx] = l + " " + f if nat in ("JPN","KOR","CHN") else f + " " + l
+    return out
+
+def generate_players(D:GameState, n:int, clubs=None, nats=None, stream:str="world") -> pd.DataFrame:
+    """n 人をまとめて生成（generate_player と同じ分布、列ごとに配列で引く）
+
+    clubs / nats はスカラーか長さ n の配列。nats の欠損は無作為に割り当てる。
+    乱数は D.rng(stream) から引く。
+    """
+    rng = D.rng(stream)
+    ids = D["next_player_id"] + 1 + np.arange(n, dtype=np.int64)
+    D["next_player_id"] += n
+    club = np.empty(n, dtype=object); club[:] = clubs
+    nat = np.empty(n, dtype=object); nat[:] = nats
+    miss = pd.isna(nat)
+    if miss.any():
+        nat[miss] = np.array(NATION_POOL, dtype=object)[rng.integers(0, len(NATION_POOL), int(miss.sum()))]
+    ov = rng.integers(58, 83, n)
+    pot = np.minimum(99, ov + rng.integers(5, 21, n))
+    pos_i = rng.integers(0, len(POSITIONS), n)
+    pos = np.array(POSITIONS, dtype=object)[pos_i]
+    age = rng.integers(17, 34, n)
+    growth = np.array(GROWTH_TYPES, dtype=object)[rng.integers(0, len(GROWTH_TYPES), n)]
+    spd, dfn, fin = np.clip(np.trunc(rng.normal(ov, 8, size=(3, n))), 30, 99).astype(np.int64)
+    morale = rng.integers(50, 76, n)
+    hg = np.where(club == USER_CLUB, rng.integers(0, 7, n), 0)
+    cols = {
+        "ID": ids, "Name": pick_names(rng, nat), "Pos": pos, "OV": ov, "POT": pot, "Age": age, "Club": club,
+        "MV": mv_from_ov_array(ov), "Apps": np.zeros(n, dtype=np.int64), "Goals": np.zeros(n, dtype=np.int64),
+        "OnLoan": np.zeros(n, dtype=bool), "LoanFrom": np.full(n, None, dtype=object),
+        "LoanAppearances": np.zeros(n, dtype=np.int64), "Growth": growth,
+        "SPD": spd, "DEF": dfn, "FIN": fin, "PosRoles": (1 << pos_i).astype(np.uint16),   # ビット順 = POSITIONS
+        "Nat": nat, "HGYearsClub": hg, "Morale": morale,
+    }
+    return D.conform(pd.DataFrame({c: cols[c] for c in PLAYER_COLS}))
+
+# -----------------------
+# 初期化（リーグ等は prepare_state でまとめて準備）
+# -----------------------
+def init_session(config:Optional[dict]=None, seed=None) -> GameState:
+    """新しいゲーム状態を生成（Streamlit 非依存）— config は make_league_config() の戻り値
+
+    seed（int / SeedSequence）が同じなら同じシーズンになる。None なら毎回異なる。
+    """
+    D = GameState()
+    D.seed_rng(seed)
+    D["league_config"] = config or make_league_config()
+    D["club_list"] = league_clubs(D["league_config"], D.rng("world"))
+    # 選手テーブルの列型（カテゴリの候補。Pos の順が PosRoles のビット順）
+    D.set_player_schema(Club=D["club_list"], LoanFrom=D["club_list"], Nat=NATION_POOL, Pos=POSITIONS, Growth=GROWTH_TYPES)
+    D["season"] = 1
+    D["week"] = 1
+    D["club_name"] = USER_CLUB
+    D["next_player_id"] = 1000
+    D["budget"] = 25_000_000
+
+    # Seed squads（クラブごとに国籍の傾向あり、ユーザーは JPN）
+    squad = D["league_config"]["squad_size"]
+    clubs = np.array(D["club_list"], dtype=object)
+    hint_pool = np.array(["ENG","ESP","ITA","GER","FRA","NED","BRA","ARG","USA","MEX","POR","BEL","CRO","SUI","TUR","RUS"], dtype=object)
+    hints = np.concatenate([["JPN"], hint_pool[D.rng("world").integers(0, len(hint_pool), len(clubs) - 1)]])
+    D["players"] = generate_players(D, squad * len(clubs), np.repeat(clubs, squad), np.repeat(hints, squad))
+
+    # Free agents
+    D["free_agents"] = generate_players(D, 40)
+
+    # Markets / Offers / Installments
+    D["transfer_offers"] = []
+    D["installment_out"] = []
+    D["installment_in"] = []
+    D["sold_sellon"] = {}
+    D["finance_log"] = []
+
+    # League / Cup / Scouting etc. は prepare_state でまとめて呼ぶ
+    D["club_meta"] = {}
+    D["divisions"] = {}
+    D["fixtures"] = []
+    D["fixtures_by_week"] = {}
+    D["standings"] = {}
+    D["results_by_week"] = {}
+    return D
+
+# ============================================
+# League (N Divisions) + Tactics + Registration + Demand Model
+# ============================================
+
+# 国籍ごとの微ボーナス（クラブ強度に加算）
+NATION_TRAIT_BONUS = {
+    "BRA": +2, "ARG": +2, "URU": +1,
+    "ESP": +2, "POR": +1, "ITA": +1, "FRA": +1, "GER": +2, "NED": +1, "BEL": +1, "CRO": +1, "SUI": 0, "TUR": 0,
+    "ENG": +1, "RUS": 0,
+    "JPN": +1, "KOR": 0, "CHN": 0, "AUS": 0,
+    "USA": 0, "CAN": 0, "MEX": +1, "EGY": 0, "GHA": 0, "NGA": 0
+}
+def _nat_bonus(nat: str) -> int:
+    return NATION_TRAIT_BONUS.get(nat, 0)
+
+def _make_extra_club_names(rng:np.random.Generator, n: int) -> list:
+    prefixes = ["Aurora","Iron","Valley","Royal","Eastern","Western","Northern","Southern","Grand","Crystal",
+                "Liberty","Cedar","Silver","Golden","Emerald","Atlantic","Pacific","Central","United","City"]
+    suffixes = ["FC","SC","Rovers","Athletic","Dynamos","Hearts","Wolves","Rangers","Stars","Titans",
+                "Comets","Falcons","Giants","Jets","Phoenix","Knights","Sparks","Mariners","Suns","Bulls"]
+    out = []
+    used = set(CPU_CLUBS + [USER_CLUB])
+    tries = 0
+    while len(out) < n:
+        tries += 1
+        name = f"{_pick(rng, prefixes)} {_pick(rng, suffixes)}"
+        if tries > 500:
+            name = f"{name} {tries // 500 + 1}"   # 組み合わせが尽きたら番号付き
+        if name not in used:
+            used.add(name)
+            out.append(name)
+    return out
+
+def _assign_nations_to_clubs(rng:np.random.Generator, clubs: list) -> dict:
+    nat_pool = [
+        "ENG","GER","FRA","ITA","ESP","POR","NED","BEL","CRO","SUI",
+        "BRA","ARG","URU","MEX","USA","CAN","JPN","KOR","TUR","AUS"
+    ]
+    meta = {}
+    for c in clubs:
+        nat = _pick(rng, nat_pool)
+        meta[c] = {"nation": nat, "pop": int(rng.integers(45, 91)), "ticket": int(rng.integers(18, 37))}
+    return meta
+
+def _round_robin(teams:List[str]) -> List[list]:
+    """サークル法の総当たり（1巡分）— 各節の (home, away) リスト"""
+    n = len(teams)
+    arr = teams[:]
+    rounds = []
+    for r in range(n-1):
+        pairs=[]
+        for i in range(n//2):
+            h=arr[i]; a=arr[-1-i]
+            pairs.append((h,a) if r%2==0 else (a,h))
+        arr = [arr[0]] + [arr[-1]] + arr[1:-1]
+        rounds.append(pairs)
+    return rounds
+
+def round_robin_fixtures(teams:List[str], div_name:str, start_week:int=1) -> List[dict]:
+    """二回戦総当たりの日程（後半は並びを反転して再生成）"""
+    fixtures=[]; w=start_week
+    for pairs in _round_robin(teams) + _round_robin(teams[::-1]):
+        for (h,a) in pairs:
+            fixtures.append({"week": w, "div": div_name, "home": h, "away": a})
+        w += 1
+    return fixtures
+
+def index_fixtures(fixtures:List[dict]) -> Dict[int, List[dict]]:
+    """週 → その週の試合（元の並び順を保つ）"""
+    by_week = {}
+    for m in fixtures:
+        by_week.setdefault(m["week"], []).append(m)
+    return by_week
+
+def week_fixtures(D:GameState, wk:int) -> List[dict]:
+    """リーグ戦の wk 週の試合"""
+    if "fixtures_by_week" not in D:
+        D["fixtures_by_week"] = index_fixtures(D.get("fixtures", []))
+    return D["fixtures_by_week"].get(wk, [])
+
+def cc_week_fixtures(D:GameState, wk:int) -> List[dict]:
+    """大陸大会の wk 週の試合"""
+    cc = D.get("cc")
+    if not cc: return []
+    if "by_week" not in cc:
+        cc["by_week"] = index_fixtures(cc["fixtures"])
+    return cc["by_week"].get(wk, [])
+
+def init_league(D:GameState):
+    """league_config どおりにディビジョンを編成（ユーザーは最下位から）、各々二回戦総当たり"""
+    if D.get("league_ready"):
+        return
+    cfg = league_config(D)
+    rng = D.rng("world")
+    clubs = D.get("club_list") or league_clubs(cfg, rng)
+    club_meta = _assign_nations_to_clubs(rng, clubs)
+
+    others = [c for c in clubs if c != USER_CLUB]
+    rng.shuffle(others)
+    m = cfg["clubs_per_division"]; names = division_names(cfg)
+    divisions = {d: others[i*m:(i+1)*m] for i, d in enumerate(names[:-1])}
+    divisions[names[-1]] = [USER_CLUB] + others[(len(names)-1)*m:]
+
+    fixtures = [m_ for d, cs in divisions.items() for m_ in round_robin_fixtures(cs, d)]
+    standings = {d: LeagueTable(cs) for d, cs in divisions.items()}
+
+    D["club_meta"] = club_meta
+    D["divisions"] = divisions
+    D["fixtures"] = fixtures
+    D["fixtures_by_week"] = index_fixtures(fixtures)
+    D["standings"] = standings
+    D["results_by_week"] = {}
+    D["league_ready"] = True
+    D.touch("clubs", "divisions")
+
+# ------- 登録ルール & 需要モデル ----------
+def ensure_registration_rules(D:GameState):
+    D.setdefault("registration_rules", {"max_foreigners":5, "min_homegrown":2})
+
+def _is_domestic(D:GameState, club:str, nat:str) -> bool:
+    club_nat = D["club_meta"].get(club, {}).get("nation")
+    return nat == club_nat
+
+def _is_homegrown_at_club(D:GameState, row) -> bool:
+    return int(row.get("HGYearsClub",0)) >= 3 and row.get("Club") == D["club_name"]
+
+def _cum_in_group(mask:np.ndarray, start:np.ndarray) -> np.ndarray:
+    """グループ先頭から数えて、自分より前にある mask=True の数"""
+    before = np.cumsum(mask) - mask
+    return before - before[start]
+
+def select_lineups(D:GameState, clubs:List[str]) -> Dict[str, np.ndarray]:
+    """複数クラブの先発 XI を一括選出（外国籍枠・HG 最低人数を満たす）"""
+    ensure_registration_rules(D)
+    rules = D["registration_rules"]
+    clubs = list(dict.fromkeys(clubs))
+    pl = D["players"]
+    groups = [D.club_rows(c) for c in clubs]
+    sizes = np.array([len(g) for g in groups], dtype=np.int64)
+    if sizes.sum() == 0:
+        return {c: pl.index[:0].to_numpy() for c in clubs}
+    rows = np.concatenate([g.to_numpy() for g in groups])
+    pos = pl.index.get_indexer(rows)
+    code = np.repeat(np.arange(len(clubs)), sizes)
+    # 国内選手 / ホームグロウン（HG はユーザークラブのみ）
+    meta = D["club_meta"]
+    club_nat = np.array([meta.get(c, {}).get("nation") for c in clubs], dtype=object)
+    sub = pl[["Nat","HGYearsClub","OV"]].iloc[pos]          # 対象クラブの行だけ取り出す
+    dom = sub["Nat"].to_numpy(dtype=object) == club_nat[code]
+    hg = (sub["HGYearsClub"].fillna(0).to_numpy(dtype=np.int64) >= 3) & (np.array(clubs, dtype=object)[code] == D["club_name"])
+    prio = np.where(hg, 3, np.where(dom, 2, 1)) + sub["OV"].to_numpy(dtype=float)/200.0
+
+    # クラブ内で prio 降順（同点はロスター順）→ 外国籍枠 → 先頭 11 人
+    order = np.lexsort((-prio, code))
+    start = np.searchsorted(code[order], code[order])
+    foreign = ~dom[order]
+    eligible = ~foreign | (_cum_in_group(foreign, start) < rules["max_foreigners"])
+    picked = np.zeros(len(rows), dtype=bool)
+    picked[order] = eligible & (_cum_in_group(eligible, start) < 11)
+
+    # HG が足りないクラブは、控えの HG と prio の低い非 HG を入れ替え
+    need = rules["min_homegrown"] - np.bincount(code, weights=picked & hg, minlength=len(clubs))
+    spare = np.bincount(code, weights=hg & ~picked, minlength=len(clubs))
+    for ci in np.flatnonzero((need > 0) & (spare > 0)):
+        grp = np.flatnonzero(code == ci)
+        reserves = grp[hg[grp] & ~picked[grp]]
+        cand = grp[picked[grp] & ~hg[grp]]
+        cand = cand[np.argsort(prio[cand], kind="stable")]
+        k = min(int(need[ci]), len(reserves), len(cand))
+        picked[cand[:k]] = False; picked[reserves[:k]] = True
+
+    bounds = np.cumsum(sizes)[:-1]
+    return {c: r[m] for c, r, m in zip(clubs, np.split(rows, bounds), np.split(picked, bounds))}
+
+def select_lineup_respecting_rules(D:GameState, club:str) -> pd.Index:
+    return pd.Index(select_lineups(D, [club])[club])
+
+def ensure_ticket_price(D:GameState):
+    base = D["club_meta"][D["club_name"]]["ticket"]
+    D.setdefault("ticket_price", base)
+
+def demand_attendance(D:GameState, home:str, away:str, price:int) -> int:
+    meta_h = D["club_meta"][home]; meta_a = D["club_meta"][away]
+    cap = 30000
+    allure = (meta_h["pop"]/100) * (0.8 + meta_a["pop"]/120)
+    p0 = meta_h["ticket"]
+    elasticity = -0.35
+    price_factor = (price/p0) ** elasticity
+    tbl = D["standings"][club_division(D, home) or _user_division(D)]
+    n = len(tbl)
+    rank_h, rank_a = tbl.rank(home) or n, tbl.rank(away) or n
+    rank_factor = 1.0 + (max(0, n + 1 - rank_h) + max(0, n + 1 - rank_a))/(5.0*n)
+    base_fill = 0.35 + allure * 0.6
+    fill = base_fill * price_factor * rank_factor * D.rng("match").uniform(0.9, 1.05)
+    return int(max(1200, min(cap, cap*fill)))
+
+# ------------- 戦術AI -------------
+DEFAULT_TACTIC = {"style":"balanced","line":50,"press":50,"tempo":50}
+# スタイル → (攻撃倍率, 守備倍率)
+STYLE_MULT = {"possession": (1.10, 1.06), "counter": (1.08, 1.12), "direct": (1.15, 0.96), "press": (1.12, 1.00)}
+def ensure_tactics_state(D:GameState):
+    D.setdefault("tactics", {})
+    D["tactics"].setdefault(D["club_name"], dict(DEFAULT_TACTIC))
+
+def _club_nat(D:GameState, club:str) -> str:
+    meta = D.get("club_meta", {})
+    return meta.get(club, {}).get("nation", "ENG")
+
+def _strength_key(D:GameState) -> tuple:
+    # 移籍（roster）・成長/トレーニング/士気（ratings）・ケミストリー・クラブ国籍で無効化
+    return (D.version("roster"), D.version("ratings"), D.version("chemistry"), D.version("clubs"))
+
+def club_strengths(D:GameState) -> Dict[str, float]:
+    """全クラブの強度を1回の groupby で計算（版が変わるまでキャッシュ）"""
+    def build():
+        pl = D["players"]
+        cols = ["OV","Morale"] if "Morale" in pl.columns else ["OV"]
+        means = pl[cols].astype(float).groupby(pl["Club"], sort=False).mean()
+        chem = D.get("chemistry_bonus", {})
+        clubs = means.index.tolist()
+        morale = means["Morale"].to_numpy() if "Morale" in means.columns else np.full(len(clubs), 60.0)
+        extra = np.array([_nat_bonus(_club_nat(D, c)) + float(chem.get(c, 0.0)) for c in clubs], dtype=float)
+        s = means["OV"].to_numpy() + (morale-60)/20.0 + extra
+        return dict(zip(clubs, s.tolist()))
+    return D.cached("club_strength", _strength_key(D), build)
+
+def _club_strength(D:GameState, club:str) -> float:
+    s = club_strengths(D).get(club)
+    if s is not None:
+        return s
+    # 選手のいないクラブは従来どおり毎回ランダム
+    chem = float(D.get("chemistry_bonus", {}).get(club, 0.0))
+    return int(D.rng("match").integers(60, 76)) + _nat_bonus(_club_nat(D, club)) + chem
+
+def _team_plan(D:GameState, club:str, opp:str) -> dict:
+    ensure_tactics_state(D)
+    base = dict(D["tactics"].get(club, DEFAULT_TACTIC))
+    strengths = club_strengths(D)
+    memo = None
+    if club in strengths and opp in strengths:
+        memo = D.cached("team_plan", _strength_key(D), dict)
+        key = (club, opp, tuple(sorted(base.items())))
+        if key in memo:
+            return memo[key]
+    s_self = _club_strength(D, club); s_opp = _club_strength(D, opp)
+    diff = s_self - s_opp
+    plan = dict(base)
+    if diff < -5:
+        plan["style"]="counter"; plan["line"]=max(20, base["line"]-15); plan["press"]=min(80, base["press"]+10); plan["tempo"]=min(80, base["tempo"]+10)
+    elif diff > 5:
+        plan["style"]="possession" if base["style"]!="direct" else "direct"
+        plan["line"]=min(80, base["line"]+10); plan["press"]=min(85, base["press"]+5); plan["tempo"]=min(85, base["tempo"]+5)
+    atk, dfn = STYLE_MULT.get(plan["style"], (1.0, 1.0))
+    atk *= 1.0 + (plan["tempo"]-50)/500.0
+    dfn *= 1.0 + (plan["press"]-50)/600.0
+    out = {"plan":plan, "atk":atk, "dfn":dfn}
+    if memo is not None:
+        memo[key] = out
+    return out
+
+# ------------- Match Sim -------------
+def fixture_lambdas(D:GameState, homes:List[str], aways:List[str]) -> np.ndarray:
+    """各試合の (λホーム, λアウェイ) — shape (n, 2)"""
+    ph = [_team_plan(D, h, a) for h, a in zip(homes, aways)]
+    pa = [_team_plan(D, a, h) for h, a in zip(homes, aways)]
+    s_h = np.array([_club_strength(D, h) for h in homes], dtype=float)
+    s_a = np.array([_club_strength(D, a) for a in aways], dtype=float)
+    atk_h = np.array([p["atk"] for p in ph]); dfn_h = np.array([p["dfn"] for p in ph])
+    atk_a = np.array([p["atk"] for p in pa]); dfn_a = np.array([p["dfn"] for p in pa])
+    sh = s_h * atk_h / np.maximum(0.5, dfn_a)
+    sa = s_a * atk_a / np.maximum(0.5, dfn_h)
+    sh *= 1.03  # ホーム微補正
+    return np.maximum(0.15, 1.10 + np.stack([sh - sa, sa - sh], axis=1)/55.0).reshape(-1, 2)
+
+def gate_income(D:GameState, home:str, away:str):
+    """ユーザーのホーム戦の入場収入（観客数はその時点の順位から）"""
+    ensure_ticket_price(D)
+    price = int(D["ticket_price"])
+    attendance = demand_attendance(D, home, away, price)
+    income = attendance * price
+    log_finance(D, +income, f"Gate ({home} vs {away}) [{attendance:,} x €{price}]")
+
+def simulate_round(D:GameState, fixtures:List[dict], gate:bool=True) -> List[dict]:
+    """週の全試合をまとめてシミュレート（Poisson 一括・Apps/Goals 一括加算）
+
+    gate=False ならゲート収入は呼び出し側で計上する（リーグ戦は順位を反映しながら play_week で）。
+    """
+    if not fixtures:
+        return []
+    homes = [m["home"] for m in fixtures]; aways = [m["away"] for m in fixtures]
+    rng = D.rng("match")
+    goals = rng.poisson(lam=fixture_lambdas(D, homes, aways))
+
+    # ルールを満たす先発選出（経験値カウント）＋ 得点者（各サイド最大3人、等確率・重複あり）
+    lineups = select_lineups(D, homes + aways)
+    app_labels = []; goal_labels = []
+    for (h, a), (gh, ga) in zip(zip(homes, aways), goals):
+        for club, g in ((h, gh), (a, ga)):
+            app_labels.append(lineups[club])
+            if g > 0:
+                squad = D.club_rows(club)
+                if len(squad):
+                    goal_labels.append(rng.choice(squad, size=min(3, int(g))))
+    pl = D["players"]
+    for col, labels in (("Apps", app_labels), ("Goals", goal_labels)):
+        if not labels: continue
+        pos = pl.index.get_indexer(np.concatenate(labels))
+        if len(pos) == 0: continue
+        vals = pl[col].to_numpy(dtype=np.int64, copy=True)
+        np.add.at(vals, pos, 1)
+        # 小さい整数型に戻すときは桁あふれで負にならないよう上限で止める
+        dt = pl[col].dtype
+        if dt.kind in "iu":
+            vals = np.minimum(vals, np.iinfo(dt).max)
+        pl[col] = vals.astype(dt)
+
+    results = []
+    for h, a, (gh, ga) in zip(homes, aways, goals):
+        if gate and h == USER_CLUB:
+            gate_income(D, h, a)
+        results.append({"home":h,"away":a,"gh":int(gh),"ga":int(ga)})
+    return results
+
+def _promote_relegate(D:GameState):
+    """シーズン終了時の自動昇降格（境界ごとの枠は league_config）と次季日程再生成"""
+    names = list(D["divisions"].keys())
+    order = {d: D["standings"][d].ordered_clubs() for d in names}
+    leaving = {d: set() for d in names}; arriving = {d: [] for d in names}
+    for i, k in enumerate(league_config(D)["promotion_slots"]):
+        if k <= 0: continue
+        upper, lower = names[i], names[i+1]
+        down = order[upper][-k:]; up = order[lower][:k]
+        leaving[upper].update(down); leaving[lower].update(up)
+        arriving[upper] += up; arriving[lower] += down
+    for d in names:
+        D["divisions"][d] = [c for c in D["divisions"][d] if c not in leaving[d]] + arriving[d]
+        D["standings"][d] = LeagueTable(D["divisions"][d])
+    D.touch("divisions"); D.touch("standings")
+
+    # 次季の対戦を再生成
+    D["fixtures"] = [m for d, cs in D["divisions"].items() for m in round_robin_fixtures(cs, d)]
+    D["fixtures_by_week"] = index_fixtures(D["fixtures"])
+    D["results_by_week"] = {}
+
+# ============================================
+# Transfers / Installments / Add-ons / Loans / Sponsors / Rights / Rumors
+# ============================================
+
+def next_offer_id(D:GameState) -> int:
+    D.setdefault("next_offer_id", 1)
+    oid = D["next_offer_id"]; D["next_offer_id"] += 1
+    return int(oid)
+
+def make_offer(
+    D:GameState,
+    player_id:int, from_club:str, to_club:str, kind:str,
+    fee_total:int, upfront:int, inst_count:int,
+    sell_on_pct:float,
+    add_ons:List[dict],
+    loan:Optional[dict],
+    inst_frequency:str="yearly",
+    buyback:Optional[dict]=None,
+    matching_right:Optional[dict]=None
+):
+    offer = {
+        "id": next_offer_id(D),
+        "player_id": int(player_id),
+        "from_club": from_club,
+        "to_club": to_club,
+        "kind": kind,                               # "permanent" | "loan"
+        "fee_total": int(fee_total),
+        "upfront": int(upfront),
+        "installments": {"count": int(inst_count), "frequency": inst_frequency},
+        "sell_on_pct": float(sell_on_pct),
+        "add_ons": add_ons or [],
+        "loan": loan,                               # {"weeks":26,"option_fee":X,"obligation":False}
+        "buyback": buyback,                         # {"fee":X,"expires":season+N}
+        "matching_right": matching_right,           # {"holder":str,"expires":season+N}
+        "status": "pending"
+    }
+    D["transfer_offers"].append(offer)
+    return offer
+
+def schedule_installments(D:GameState, deal_id:int, total:int, count:int, start_week:int, direction:str, frequency:str="yearly"):
+    if count <= 0 or total <= 0: return
+    if frequency == "monthly": step = 4
+    elif frequency == "halfyear": step = 7
+    else: step = season_weeks(D)
+    amt = total // count
+    for k in range(count):
+        due = start_week + k*step
+        rec = {"deal_id":deal_id, "due_week":due, "amount":amt, "remaining":count-k}
+        if direction=="out": D["installment_out"].append(rec)
+        else: D["installment_in"].append(rec)
+
+def apply_installments_this_week(D:GameState):
+    wk = D["week"]
+    outs = [x for x in D["installment_out"] if x["due_week"]==wk]
+    for r in outs:
+        D["budget"] -= int(r["amount"])
+        log_finance(D, -int(r["amount"]), f"Installment payment (deal {r['deal_id']})")
+    D["installment_out"] = [x for x in D["installment_out"] if x["due_week"]!=wk]
+    ins = [x for x in D["installment_in"] if x["due_week"]==wk]
+    for r in ins:
+        D["budget"] += int(r["amount"])
+        log_finance(D, +int(r["amount"]), f"Installment received (deal {r['deal_id']})")
+    D["installment_in"] = [x for x in D["installment_in"] if x["due_week"]!=wk]
+
+def maybe_trigger_add_on(D:GameState, kind:str, pid:int, value:int):
+    # 例: {"kind":"appearances","threshold":20,"amount":500000}
+    # 実際の紐付けは簡略化（将来: deal_id 紐付け）
+    pass
+
+def simulate_cpu_resale(D:GameState, prob_per_week:float=0.30, max_deals:int=1):
+    rng = D.rng("market")
+    pool = np.flatnonzero(D["players"]["Club"].isin(cpu_clubs(D)).to_numpy())   # 行位置だけ持つ
+    if not len(pool) or rng.random()>prob_per_week: return
+    for _ in range(max_deals):
+        cand = D["players"].iloc[_pick(rng, pool)]
+        old_club = cand["Club"]
+        price = int(cand["MV"] * rng.uniform(1.1, 1.8))
+        ensure_rights_state(D)
+        mr = D["matching_rights"].get(int(cand["ID"]))
+        if mr and mr["holder"]==USER_CLUB and D["season"] <= mr["expires_season"]:
+            add_news(D, {"type":"match_right","week":D["week"],"title":"Matching Right Opportunity",
+                      "body":f"You may match €{price:,} to sign {cand['Name']}.",
+                      "player_id": int(cand["ID"]), "price": int(price), "from_club": old_club})
+        new_club = _pick(rng, [c for c in cpu_clubs(D) if c != old_club])
+        idx = D.player_label(int(cand["ID"]))
+        D.set_player_club(idx, new_club)
+
+def loan_weekly_tick(D:GameState):
+    # （拡張用スタブ）
+    pass
+
+def is_window_open(D:GameState) -> bool:
+    return D["week"] in [1,2,8,9,10]
+
+def generate_cpu_offers_for_your_players(D:GameState, prob:float=0.40):
+    if not is_window_open(D): return
+    rng = D.rng("market")
+    if rng.random() > prob: return
+    you = D.club_roster(USER_CLUB)
+    if you.empty: return
+    target_club = _pick(rng, cpu_clubs(D))
+    pool = D.club_roster(target_club)
+    cnt = pool["Pos"].value_counts() if not pool.empty else pd.Series(dtype=int)
+    need_order = ["ST","CB","CM","GK","LW","RW","AM","LB","RB","DM"]
+    need_pos = next((p for p in need_order if cnt.get(p,0) < 2), _pick(rng, need_order))
+    cand = you[you["Pos"]==need_pos]
+    if cand.empty: cand = you
+    p = cand.sample(1, random_state=rng).iloc[0]
+    fee = int(p["MV"] * rng.uniform(1.15, 1.9))
+    upfront = int(fee * rng.uniform(0.35, 0.6))
+    inst_n  = _pick(rng, [0,2,3])
+    sellon  = _pick(rng, [0.0, 0.1, 0.15])
+    addons  = [{"kind":"appearances","threshold":_pick(rng, [15,20,25]),"amount":int(fee*0.05)}]
+    if p["Pos"] in ("ST","LW","RW","AM"):
+        addons.append({"kind":"goals","threshold":_pick(rng, [10,15]),"amount":int(fee*0.04)})
+    make_offer(
+        D,
+        player_id=int(p["ID"]),
+        from_club=target_club,
+        to_club=USER_CLUB,
+        kind="permanent",
+        fee_total=fee, upfront=upfront, inst_count=inst_n,
+        sell_on_pct=sellon, add_ons=addons, loan=None,
+        inst_frequency="yearly", buyback=None, matching_right=None
+    )
+
+# ------- Sponsors -------
+def ensure_sponsor_state(D:GameState):
+    D.setdefault("sponsors_available", [])
+    D.setdefault("sponsors_active", [])
+    D.setdefault("next_sponsor_id", 1)
+    if not D["sponsors_available"]:
+        generate_sponsor_offers(D)
+
+def _user_division(D:GameState) -> str:
+    for div, clubs in D.get("divisions", {}).items():
+        if USER_CLUB in clubs:
+            return div
+    return list(D["divisions"])[-1] if D.get("divisions") else "D1"
+
+def generate_sponsor_offers(D:GameState):
+    meta = D.get("club_meta", {})
+    pop = meta.get(USER_CLUB, {}).get("pop", 60)
+    div = _user_division(D)
+    tier_mult = 1.2 if div == "D1" else 1.0
+    brands = ["VectorX", "Hikari Bank", "Futura Energy", "Yamazaki Foods", "NovaTech", "Sunrise Mobile", "Atlas Air"]
+    rng = D.rng("market")
+    offers = []
+    for _ in range(3):
+        brand = _pick(rng, brands)
+        weekly = int(20_000 * tier_mult * (0.8 + pop/100))
+        bonus_top = int(750_000 * tier_mult)
+        bonus_win = int(1_500_000 * tier_mult)
+        seasons = _pick(rng, [1,2])
+        offers.append({"id": D["next_sponsor_id"], "brand": brand, "tier": "Standard" if seasons==1 else "Premium",
+                       "weekly": weekly, "bonus_top": bonus_top, "bonus_win": bonus_win, "seasons": seasons})
+        D["next_sponsor_id"] += 1
+    D["sponsors_available"].extend(offers)
+
+def accept_sponsor(D:GameState, offer_id:int) -> str:
+    rec = next((x for x in D["sponsors_available"] if x["id"] == offer_id), None)
+    if not rec: return "not_found"
+    c = dict(rec); c["seasons_left"] = c["seasons"]
+    D["sponsors_active"].append(c)
+    D["sponsors_available"] = [x for x in D["sponsors_available"] if x["id"] != offer_id]
+    log_finance(D, 0, f"Sponsor signed: {rec['brand']} ({rec['tier']})")
+    return "ok"
+
+def apply_sponsor_income(D:GameState):
+    total = sum(s["weekly"] for s in D.get("sponsors_active", []))
+    if total:
+        D["budget"] += total
+        log_finance(D, +total, f"Sponsors weekly income ({len(D['sponsors_active'])} deals)")
+
+def sponsor_on_season_end(D:GameState):
+    div = _user_division(D)
+    pos = D["standings"][div].rank(USER_CLUB)
+    d_i = list(D["divisions"]).index(div)
+    promo = division_slots(D, d_i)[0]
+    paid = 0
+    for s in D.get("sponsors_active", []):
+        if pos == 1:
+            paid += s["bonus_win"]
+        elif d_i > 0 and pos <= promo:
+            paid += s["bonus_top"]
+        elif pos <= 4 and d_i == 0:
+            paid += int(s["bonus_top"] * 0.75)
+    if paid:
+        D["budget"] += paid
+        log_finance(D, +paid, f"Sponsor season bonus (pos={pos} in {div})")
+    new_active=[]
+    for s in D.get("sponsors_active", []):
+        s = dict(s); s["seasons_left"] = max(0, int(s.get("seasons_left", 1))-1)
+        if s["seasons_left"]>0: new_active.append(s)
+        else: log_finance(D, 0, f"Sponsor ended: {s['brand']}")
+    D["sponsors_active"] = new_active
+    generate_sponsor_offers(D)
+
+# ------- Rights & News -------
+def ensure_rights_state(D:GameState):
+    D.setdefault("buyback_rights", {})
+    D.setdefault("matching_rights", {})
+
+def exercise_matching_right(D:GameState, pid:int, price:int, from_club:str) -> str:
+    idx = D.player_label(pid)
+    if idx is None: return "not_found"
+    if D["budget"] < price: return "insufficient_budget"
+    D["budget"] -= int(price)
+    log_finance(D, -int(price), f"Matching Right exercised (PID {pid})")
+    D.set_player_club(idx, D["club_name"])
+    D["matching_rights"].pop(pid, None)
+    return "ok"
+
+def ensure_news_state(D:GameState):
+    D.setdefault("news", [])
+
+def add_news(D:GameState, item:dict):
+    ensure_news_state(D)
+    D["news"].append(item)
+
+def generate_rumors_weekly(D:GameState):
+    ensure_news_state(D)
+    cpu = cpu_clubs(D)
+    rng = D.rng("news")
+    pool = np.flatnonzero(D["players"]["Club"].isin(cpu).to_numpy())
+    if not len(pool) or rng.random()>0.5: return
+    p = D["players"].iloc[_pick(rng, pool)]
+    club = _pick(rng, cpu)
+    truth = rng.random()<0.4
+    body = f"{club} are {'seriously ' if truth else ''}monitoring {p['Name']} ({p['Club']})."
+    add_news(D, {"type":"rumor","week":D["week"],"title":"Transfer Rumor","body":body})
+
+# ============================================
+# Scouting + FoW + Grades + Reports
+# ============================================
+
+REGION_OF = {
+    "ENG":"EU","ESP":"EU","ITA":"EU","GER":"EU","FRA":"EU","NED":"EU","POR":"EU","BEL":"EU","CRO":"EU","SUI":"EU","TUR":"EU",
+    "BRA":"SA","ARG":"SA","URU":"SA","MEX":"NA","USA":"NA","CAN":"NA",
+    "JPN":"AS","KOR":"AS","CHN":"AS","AUS":"OC","RUS":"EU","EGY":"AF","GHA":"AF","NGA":"AF"
+}
+def nation_to_region(nat:str) -> str:
+    return REGION_OF.get(nat, "GLB")
+
+def ensure_scout_reports(D:GameState):
+    D.setdefault("scout_reports", {})
+
+def write_scout_report(D:GameState, pid:int, scout:dict, est_ov:int):
+    ensure_scout_reports(D)
+    p = D.player_row(pid)
+    if p is None: return
+    summary = f"{p['Name']} ({p['Pos']}, {p['Age']}y, Nat {p['Nat']})\n" \
+              f"Strength: {'Finishing' if p['FIN']>=p['DEF'] and p['FIN']>=p['SPD'] else ('Defense' if p['DEF']>=p['SPD'] else 'Speed')}\n" \
+              f"Risk: {'Low' if scout['grade']>=4 else 'Medium' if scout['grade']==3 else 'High'}\n" \
+              f"Estimated OV: {est_ov}"
+    rec = {"week": D["week"], "scout": scout["name"], "grade": scout["grade"], "summary": summary, "est_ov": est_ov}
+    D["scout_reports"].setdefault(int(pid), []).append(rec)
+
+def ensure_scouting_state(D:GameState):
+    D.setdefault("scout_knowledge", KnowledgeStore())
+    D.setdefault("scouts", [])
+    D.setdefault("next_scout_id", 1)
+    D.setdefault("scout_assignments", {})
+    D.setdefault("scout_shortlist", set())
+    if not D["scouts"]:
+        def add_scout(name, region, grade, coverage_base):
+            sid = D["next_scout_id"]; D["next_scout_id"] += 1
+            sigma_floor_map = {1:8.0, 2:6.0, 3:4.5, 4:3.0, 5:2.0}
+            cov = int(coverage_base * (0.8 + 0.1*grade))
+            D["scouts"].append({
+                "id": sid, "name": name, "region": region,
+                "grade": int(grade),
+                "sigma_floor": sigma_floor_map[int(grade)],
+                "coverage": cov,
+                "salary": 8000 + grade*4000
+            })
+            D["scout_assignments"][sid] = {"type":"region", "value":region}
+        add_scout("K. Morita", "AS", 3, 20)
+        add_scout("R. Alvarez","SA", 4, 18)
+    K = D["scout_knowledge"]
+    if not len(K):
+        pl = D["players"]
+        own = (pl["Club"] == D["club_name"]).to_numpy()
+        mu = pl["OV"].to_numpy(dtype=float)
+        rng = D.rng("scouting")
+        mu[~own] = np.trunc(mu[~own] + rng.normal(0, 8, size=int((~own).sum())))
+        K.add(pl["ID"], mu, np.where(own, 0.0, 12.0), np.where(own, D["week"], 0))
+        fa = D["free_agents"]
+        if not fa.empty:
+            K.add(fa["ID"], np.trunc(fa["OV"].to_numpy(dtype=float) + rng.normal(0, 10, size=len(fa))), 14.0, 0)
+        D.touch("knowledge")
+
+def visible_ov_bulk(D:GameState, ids) -> np.ndarray:
+    """ユーザー視点の推定 OV を ID 配列まとめて返す（自クラブは真値、未知の選手はここで初期化）"""
+    K = D["scout_knowledge"]
+    ids = np.asarray(ids, dtype=np.int64)
+    pl, fa = D["players"], D["free_agents"]
+    p_pos = pd.Index(pl["ID"].to_numpy(dtype=np.int64)).get_indexer(ids)
+    f_pos = pd.Index(fa["ID"].to_numpy(dtype=np.int64)).get_indexer(ids) if not fa.empty else np.full(len(ids), -1)
+    true = np.full(len(ids), np.nan)
+    true[p_pos >= 0] = pl["OV"].to_numpy(dtype=float)[p_pos[p_pos >= 0]]
+    in_fa = (p_pos < 0) & (f_pos >= 0)
+    true[in_fa] = fa["OV"].to_numpy(dtype=float)[f_pos[in_fa]]
+    sl = K.slots(ids)
+    # 未知の選手（ID 順に1回ずつ乱数を引く）
+    # ここでの追加は版を上げない（表示の途中で呼ばれるので、上げると同じ週の表を毎回作り直す）
+    need = (sl < 0) & ~np.isnan(true)
+    if need.any():
+        new_ids, first = np.unique(ids[need], return_index=True)
+        order = np.argsort(first)
+        new_ids, new_ov = new_ids[order], true[need][first[order]]
+        K.add(new_ids, np.trunc(new_ov + D.rng("scouting").normal(0, 10, size=len(new_ids))), 14.0, 0)
+        sl = K.slots(ids)
+    out = np.full(len(ids), 60, dtype=np.int64)
+    known = sl >= 0
+    out[known] = np.clip(np.rint(K.mu[sl[known]]), 30, 99).astype(np.int64)
+    own = np.zeros(len(ids), dtype=bool)
+    own[p_pos >= 0] = (pl["Club"].to_numpy(dtype=object)[p_pos[p_pos >= 0]] == D["club_name"])
+    out[own] = true[own].astype(np.int64)
+    return out
+
+def visible_ov_for_user(D:GameState, pid:int) -> int:
+    return int(visible_ov_bulk(D, [pid])[0])
+
+def apply_staff_weekly_costs(D:GameState):
+    total = sum(s["salary"] for s in D.get("scouts", []))
+    if total:
+        D["budget"] -= total
+        log_finance(D, -total, f"Scouting staff wages ({len(D['scouts'])} scouts)")
+
+def scouting_weekly_tick(D:GameState):
+    if not D.get("scouts"): return
+    meta = D.get("club_meta", {})
+    club_nat = {c: meta.get(c, {}).get("nation","ENG") for c in list(meta.keys())}
+    club_region = {c: nation_to_region(n) for c, n in club_nat.items()}
+    K = D["scout_knowledge"]
+    rng = D.rng("scouting")
+    # 必要な列だけ配列で持つ（プールは行位置で扱う）
+    pl, fa = D["players"], D["free_agents"]
+    p_ids = pl["ID"].to_numpy(dtype=np.int64); p_ov = pl["OV"].to_numpy(dtype=float)
+    p_club = pl["Club"].to_numpy(dtype=object)
+    not_own = p_club != D["club_name"]
+    shortlist = np.array(sorted(D.get("scout_shortlist", set())), dtype=np.int64)
+    def pool_for(assign:dict):
+        """(players の行位置, FA を末尾に含めるか)"""
+        t = assign["type"]; v = assign["value"]
+        if t == "region":
+            clubs = [c for c,n in club_nat.items() if nation_to_region(n)==v]
+            return np.flatnonzero(pl["Club"].isin(clubs).to_numpy() & not_own), True
+        elif t == "club":
+            return np.flatnonzero((p_club == v) & not_own), False
+        elif t == "shortlist":
+            return np.flatnonzero(np.isin(p_ids, shortlist) & not_own), False
+        return np.zeros(0, dtype=np.intp), False
+
+    for s in D["scouts"]:
+        assign = D["scout_assignments"].get(s["id"], {"type":"region","value":s["region"]})
+        rows, with_fa = pool_for(assign)
+        ids, true, club = p_ids[rows], p_ov[rows], p_club[rows]
+        if with_fa and not fa.empty:
+            ids = np.concatenate([ids, fa["ID"].to_numpy(dtype=np.int64)])
+            true = np.concatenate([true, fa["OV"].to_numpy(dtype=float)])
+            club = np.concatenate([club, np.full(len(fa), None, dtype=object)])
+        if not len(ids): continue
+        # ショートリスト優先で coverage 人まで
+        cap = int(s["coverage"])
+        on = np.isin(ids, shortlist)
+        pri = np.flatnonzero(on)[:cap//2]
+        take = np.concatenate([pri, np.flatnonzero(~on)[:cap - len(pri)]])
+        ids, true, club = ids[take], true[take], club[take]
+        noise = rng.normal(0, 10, size=len(ids))    # 初見の選手用（従来どおり全員分引く）
+        sl = K.slots(ids)
+        new = sl < 0
+        if new.any():
+            sl[new] = K.add(ids[new], np.trunc(true[new] + noise[new]), 14.0, 0)
+        # カバー範囲の一括更新
+        reg = np.array([club_region.get(c, "GLB") if isinstance(c, str) else "GLB" for c in club], dtype=object)
+        on_list = on[take]
+        alpha = 0.35 + 0.1*(reg == s["region"]) + 0.15*on_list
+        mu = K.mu[sl]
+        K.mu[sl] = mu + alpha * (true - mu)
+        K.sigma[sl] = np.maximum(s["sigma_floor"], K.sigma[sl] * np.where(on_list, 0.85, 0.90))
+        K.last_seen[sl] = D["week"]
+        rolls = rng.random(len(ids))
+        for pid, slot in zip(ids[rolls < 0.20], sl[rolls < 0.20]):
+            write_scout_report(D, int(pid), s, int(round(float(K.mu[slot]))))
+    D.touch("knowledge")
+
+# ============================================
+# Youth / Growth
+# ============================================
+YOUTH_INTAKE_WEEK = 2
+
+def ensure_player_nations_and_hg(D:GameState):
+    if D["players"].empty: return
+    need_cols = {"Nat","HGYearsClub","Morale","SPD","DEF","FIN","PosRoles"}
+    for c in need_cols:
+        if c not in D["players"].columns:
+            D["players"][c] = None
+    pl = D["players"]
+    missing = pl[list(need_cols)].isna().any(axis=1)
+    if not missing.any(): return
+    rng = D.rng("world")
+    for idx, p in pl[missing].iterrows():
+        if pd.isna(p.get("Nat")):
+            D["players"].at[idx,"Nat"] = _pick(rng, NATION_POOL)
+        if pd.isna(p.get("HGYearsClub")):
+            D["players"].at[idx,"HGYearsClub"] = int(rng.integers(0, 7)) if p["Club"]==USER_CLUB else 0
+        if pd.isna(p.get("Morale")):
+            D["players"].at[idx,"Morale"] = int(rng.integers(50, 76))
+            D.touch("ratings")
+        if pd.isna(p.get("SPD")):
+            ov = int(p["OV"])
+            D["players"].at[idx,"SPD"] = max(30, min(99, int(rng.normal(ov,8))))
+            D["players"].at[idx,"DEF"] = max(30, min(99, int(rng.normal(ov,8))))
+            D["players"].at[idx,"FIN"] = max(30, min(99, int(rng.normal(ov,8))))
+        if pd.isna(p.get("PosRoles")):
+            D["players"].at[idx,"PosRoles"] = D.roles_mask([p["Pos"]])
+
+def youth_intake(D:GameState):
+    if "academy" not in D:
+        D["academy"] = D.conform(pd.DataFrame(columns=D["players"].columns.union(["IsYouth"], sort=False)))
+    rng = D.rng("youth")
+    n = int(rng.integers(6, 9))
+    kids=[]
+    for _ in range(n):
+        pid = next_player_id(D)   # 固定の ID 帯は大規模ワールドで既存選手と衝突する
+        p = generate_player(rng, pid, None, _pick(rng, NATION_POOL))
+        p["OV"] = int(rng.integers(45, 61)); p["MV"]=mv_from_ov_strict(p["OV"])
+        p["Age"] = int(rng.integers(15, 18)); p["IsYouth"]=True
+        kids.append(p)
+        D["scout_knowledge"].set(pid, int(p["OV"] + rng.normal(0, 6)), 8.0, 0)
+    if kids:
+        D.append_players("academy", kids)
+        D.touch("knowledge")
+
+def promote_from_academy(D:GameState, pid:int) -> str:
+    row = D.remove_player("academy", pid)
+    if row is None: return "not_found"
+    player = row.to_dict()
+    player["IsYouth"] = False; player["Club"] = D["club_name"]
+    player["MV"] = mv_from_ov_strict(int(player["OV"]))
+    D.append_players("players", [player])
+    D["scout_knowledge"].set(pid, int(player["OV"]), 0.0, D["week"])
+    D.touch("knowledge")
+    return "ok"
+
+def release_from_academy(D:GameState, pid:int) -> str:
+    row = D.remove_player("academy", pid)
+    if row is None: return "not_found"
+    pl = row.to_dict()
+    pl["Club"] = None; pl["IsYouth"]=False
+    D.append_players("free_agents", [pl])
+    return "ok"
+
+GROWTH_PEAK = {"早熟":22, "標準":25, "晩成":28}
+
+def _growth_delta(age:int, gtype:str, pot:int, ov:int) -> float:
+    peak = GROWTH_PEAK.get(gtype, 25)
+    d = peak - age
+    base = 0.20 + max(0, (10 - abs(d))) * 0.04
+    headroom = max(0, pot - ov)
+    damp = 0.3 + 0.7*(headroom/ max(1, pot-30))
+    val = base * damp
+    return float(max(-0.25, min(0.8, val)))
+
+def _growth_delta_array(df:pd.DataFrame) -> np.ndarray:
+    """_growth_delta の列演算版"""
+    ov = df["OV"].to_numpy(dtype=float); pot = df["POT"].to_numpy(dtype=float); age = df["Age"].to_numpy(dtype=float)
+    gtype = df["Growth"] if "Growth" in df.columns else pd.Series("標準", index=df.index)
+    peak = gtype.map(GROWTH_PEAK).astype(float).fillna(25).to_numpy()
+    base = 0.20 + np.maximum(0, 10 - np.abs(peak - age)) * 0.04
+    damp = 0.3 + 0.7*(np.maximum(0, pot - ov) / np.maximum(1, pot - 30))
+    return np.clip(base * damp, -0.25, 0.8)
+
+def _grow_table(rng:np.random.Generator, df:pd.DataFrame, mult:float, sd:float, lo:int, hi:int) -> np.ndarray:
+    """OV を1週分成長させて新しい OV 配列を返す（MV は変化した行だけ再計算）"""
+    ov = df["OV"].to_numpy(dtype=np.int64)
+    delta = _growth_delta_array(df) * mult
+    new_ov = np.clip(ov + rng.normal(delta, sd), lo, hi).astype(np.int64)
+    changed = new_ov != ov
+    if changed.any():
+        df["OV"] = new_ov.astype(df["OV"].dtype)
+        df["MV"] = np.where(changed, mv_from_ov_array(new_ov), df["MV"].to_numpy(dtype=np.int64)).astype(df["MV"].dtype)
+    return new_ov
+
+def apply_growth_weekly(D:GameState):
+    pl = D["players"]
+    if not pl.empty:
+        new_ov = _grow_table(D.rng("growth"), pl, 1.0, 0.1, 30, 99)
+        K = D["scout_knowledge"]
+        sl = K.slots(pl["ID"])
+        known = sl >= 0
+        sl = sl[known]
+        K.mu[sl] += 0.05*(new_ov[known] - K.mu[sl])
+        D.touch("ratings"); D.touch("knowledge")
+    ac = D.get("academy", pd.DataFrame())
+    if not ac.empty:
+        _grow_table(D.rng("growth"), ac, 1.1, 0.15, 25, 95)
+
+# ============================================
+# Training & Position Conversion
+# ============================================
+POS_WEIGHTS = {
+    "GK": (0.15,0.50,0.05), "CB": (0.10,0.65,0.10), "LB": (0.20,0.50,0.15),
+    "RB": (0.20,0.50,0.15), "DM": (0.20,0.55,0.15), "CM": (0.25,0.45,0.20),
+    "AM": (0.25,0.35,0.30), "LW": (0.30,0.25,0.35), "RW": (0.30,0.25,0.35), "ST": (0.25,0.20,0.45)
+}
+def ensure_training_state(D:GameState):
+    D.setdefault("training_plans", {})
+
+def _recalc_ov_by_substats(row) -> int:
+    w = POS_WEIGHTS.get(row["Pos"], (0.25,0.35,0.40))
+    ov = int(round(w[0]*int(row["SPD"]) + w[1]*int(row["DEF"]) + w[2]*int(row["FIN"])))
+    return max(30, min(99, ov))
+
+def apply_training_weekly(D:GameState):
+    ensure_training_state(D)
+    for pid, plan in list(D["training_plans"].items()):
+        idx = D.player_label(int(pid))
+        if idx is None:
+            D["training_plans"].pop(pid, None); continue
+        f = plan.get("focus","speed")
+        inc = {"speed":("SPD",1.2),"defense":("DEF",1.3),"finishing":("FIN",1.35)}[f]
+        col, base = inc
+        cur = int(D["players"].at[idx, col])
+        gain = max(0, D.rng("growth").normal(base, 0.3))
+        D["players"].at[idx, col] = int(min(99, cur + gain))
+        D.touch("ratings")                  # 能力値・ポジションの変更（スカッド表の版）
+        row = D["players"].loc[idx]
+        new_ov = _recalc_ov_by_substats(row)
+        if new_ov != int(row["OV"]):
+            D["players"].at[idx, "OV"] = new_ov
+            D["players"].at[idx, "MV"] = mv_from_ov_strict(new_ov)
+        if plan.get("pos_target"):
+            plan["weeks_left"] = int(plan.get("weeks_left",0)) - 1
+            if plan["weeks_left"] <= 0:
+                roles = int(row["PosRoles"]) or D.roles_mask([row["Pos"]])
+                D["players"].at[idx, "PosRoles"] = roles | D.roles_mask([plan["pos_target"]])
+                D["players"].at[idx, "Pos"] = plan["pos_target"]
+                plan["pos_target"] = None; plan["weeks_left"] = 0
+    for pid in list(D["training_plans"].keys()):
+        pl = D["training_plans"][pid]
+        if pl.get("pos_target") is None and pl.get("focus") is None:
+            D["training_plans"].pop(pid, None)
+
+# ============================================
+# Mentoring / Chemistry
+# ============================================
+def ensure_mentoring_state(D:GameState):
+    D.setdefault("mentoring_pairs", [])
+    D.setdefault("chemistry_bonus", {})
+
+def apply_mentoring_weekly(D:GameState):
+    ensure_mentoring_state(D)
+    boost_team = {}
+    for pair in D["mentoring_pairs"]:
+        m = int(pair["mentor"]); t = int(pair["mentee"])
+        idx_m = D.player_label(m); idx = D.player_label(t)
+        if idx_m is None or idx is None: continue
+        pm = D["players"].loc[idx_m]; pt = D["players"].loc[idx]
+        if pm["Club"] != pt["Club"]: continue
+        if int(pm["Age"])>=28 or int(pm["OV"])>=75:
+            if int(pt["Age"])<=22:
+                new_morale = int(min(99, int(pt["Morale"])+2))
+                D["players"].at[idx,"Morale"] = new_morale
+                D.touch("ratings")
+                for c in ["SPD","DEF","FIN"]:
+                    D["players"].at[idx,c] = int(min(99, int(pt[c])+D.rng("growth").uniform(0.1,0.3)))
+                same_nat = 1 if pm["Nat"]==pt["Nat"] else 0
+                same_pos = 1 if pm["Pos"]==pt["Pos"] else 0
+                club = pm["Club"]
+                boost_team[club] = boost_team.get(club, 0.0) + 0.03 + 0.02*same_nat + 0.02*same_pos
+    for c, v in boost_team.items():
+        prev = float(D["chemistry_bonus"].get(c, 0.0))
+        D["chemistry_bonus"][c] = float(min(2.0, prev*0.7 + v))
+    if boost_team:
+        D.touch("chemistry")
+
+# ============================================
+# Contracts & Payroll
+# ============================================
+def ensure_contract_state(D:GameState):
+    D.setdefault("contracts", {})
+    D.setdefault("pending_terms", {})
+    D.setdefault("agent_profiles", {})
+
+def ensure_player_wages(D:GameState):
+    ensure_contract_state(D)
+    for _, p in D.club_roster(D["club_name"]).iterrows():
+        pid = int(p["ID"])
+        if pid not in D["contracts"]:
+            ov = int(p["OV"])
+            wage = int(ov * 900)
+            terms = {"wage": wage,"signing": 0,"apps_bonus": 0,"goals_bonus": 0,"length_weeks": 52*3,"release_clause": int(p["MV"]*1.8)}
+            D["contracts"][pid] = terms
+            D.touch("contracts")
+
+def apply_player_wages_weekly(D:GameState):
+    if not D.get("contracts"): return
+    you = D.club_roster(D["club_name"])
+    you_ids = you["ID"].astype(int).tolist()
+    payroll = 0; bonus = 0
+    for pid, apps, goals in zip(you_ids, you["Apps"].astype(int), you["Goals"].astype(int)):
+        t = D["contracts"].get(int(pid))
+        if not t: continue
+        payroll += t["wage"]
+        if apps > 0 and t["apps_bonus"]>0: bonus += t["apps_bonus"]
+        if goals > 0 and t["goals_bonus"]>0: bonus += t["goals_bonus"]
+        t["length_weeks"] = max(0, int(t["length_weeks"]) - 1)
+    total = payroll + bonus
+    if total:
+        D["budget"] -= total
+        log_finance(D, -total, f"Player wages ({len(you_ids)} players) + bonuses")
+
+def _agent_profile(D:GameState, pid:int):
+    ensure_contract_state(D)
+    if pid not in D["agent_profiles"]:
+        rng = D.rng("market")
+        D["agent_profiles"][pid] = {
+            "tough": round(float(rng.uniform(0.3, 0.9)), 2),
+            "risk":  round(float(rng.uniform(0.2, 0.8)), 2),
+            "patience": int(rng.integers(2, 6))
+        }
+    return D["agent_profiles"][pid]
+
+def baseline_terms_for(D:GameState, pid:int) -> dict:
+    p = D.player_row(pid, ("players",))
+    ov, pos = int(p["OV"]), str(p["Pos"])
+    is_att = pos in ("ST","LW","RW","AM")
+    base_wage = int((ov**1.1) * (1.05 if is_att else 0.95) * 12)
+    base_sign = int(p["MV"] * 0.08)
+    base_apps = 0 if ov>=80 else int(1000 + ov*50)
+    base_goals= int(2000 + ov*60) if is_att else 0
+    base_clause = int(p["MV"] * (1.8 if ov<80 else 2.4))
+    return {"wage": base_wage, "signing": base_sign, "apps_bonus": base_apps, "goals_bonus": base_goals,
+            "length_weeks": 52*_pick(D.rng("market"), [2,3,4]), "release_clause": base_clause}
+
+def evaluate_contract_offer(D:GameState, pid:int, offer:dict, round_i:int) -> dict:
+    prof = _agent_profile(D, pid)
+    target = baseline_terms_for(D, pid)
+    ask = {k: int(target[k] * (1.10 + prof["tough"]*0.25)) for k in target}
+    def ratio(k, w=1.0):
+        if k in ("apps_bonus","goals_bonus"):
+            t = ask[k]; o = offer.get(k,0)
+            return (t / max(1,o+1)) * w
+        else:
+            t = ask[k]; o = offer.get(k,t)
+            return (t / max(1,o)) * w
+    score = 0.0
+    score += ratio("wage", 1.6)
+    score += ratio("signing", 1.2)
+    score += max(0.5, (offer.get("length_weeks", ask["length_weeks"]) / ask["length_weeks"])) * 0.8
+    score += (ask["release_clause"] / max(1, offer.get("release_clause", ask["release_clause"]))) * 1.4
+    bonus_term = (max(1, offer.get("apps_bonus",1)) / max(1, ask["apps_bonus"])) + (max(1, offer.get("goals_bonus",1)) / max(1, ask["goals_bonus"])+0.01)
+    score *= (1.0 - min(0.3, 0.1*(bonus_term-1)))
+    thresh = 2.8 - 0.3*round_i + (prof["risk"]-0.5)
+    if score <= thresh:
+        return {"decision":"accept", "counter":None, "ask":ask, "profile":prof}
+    if round_i >= prof["patience"]:
+        return {"decision":"walkaway", "counter":None, "ask":ask, "profile":prof}
+    counter = {}
+    for k in ask:
+        if k in ("apps_bonus","goals_bonus"):
+            counter[k] = int(max(ask[k], offer.get(k,0)))
+        elif k=="release_clause":
+            counter[k] = int(max(ask[k], offer.get(k, ask[k])))
+        elif k=="length_weeks":
+            counter[k] = int(max(ask[k], offer.get(k, ask[k])))
+        else:
+            want = int(ask[k]* (0.95 + 0.25*D.rng("market").random()))
+            counter[k] = max(want, offer.get(k,0))
+    return {"decision":"counter", "counter":counter, "ask":ask, "profile":prof}
+
+def finalize_contract_on_join(D:GameState, pid:int, terms:dict):
+    ensure_contract_state(D)
+    t = dict(terms)
+    D["contracts"][pid] = t
+    D.touch("contracts")
+    sign = int(t.get("signing",0))
+    if sign>0:
+        D["budget"] -= sign
+        log_finance(D, -sign, f"Signing bonus (PID {pid})")
+
+# ============================================
+# Continental Cup – Groups + H2H + 2-leg SF + Final
+# ============================================
+CC_WEEKS_GROUP = [2,4,6,7,9,11]
+CC_SF_LEGS     = (12,13)
+CC_WEEK_FINAL  = 14
+
+def continental_entrants(D:GameState) -> List[str]:
+    """大陸大会の出場16クラブ（上位 continental_divisions 部の人気順、足りなければ下位から補充）"""
+    names = list(D["divisions"].keys())
+    top = names[:league_config(D)["continental_divisions"]]
+    cand = [c for d in top for c in D["divisions"][d]]
+    for d in names[len(top):]:
+        if len(cand) >= CC_TEAMS: break
+        cand += D["divisions"][d]
+    uniq = []
+    for c in cand:
+        if c not in uniq:
+            uniq.append(c)
+    if USER_CLUB not in uniq:
+        uniq.insert(0, USER_CLUB)
+    return sorted(uniq, key=lambda c: D["club_meta"][c]["pop"], reverse=True)[:CC_TEAMS]
+
+def init_continental_groups_for_season(D:GameState):
+    uniq = continental_entrants(D)
+    pots = [uniq[i:i+4] for i in range(0, CC_TEAMS, 4)]
+    groups = {"A":[], "B":[], "C":[], "D":[]}
+    nations_by_g = {g:set() for g in groups}
+    for pot in pots:
+        D.rng("world").shuffle(pot)
+        for team in pot:
+            nat = D["club_meta"][team]["nation"]
+            choices = sorted(groups.keys(), key=lambda g: (nat in nations_by_g[g], len(groups[g])))
+            placed = False
+            for g in choices:
+                if len(groups[g])<4 and (nat not in nations_by_g[g] or all(len(groups[x])==4 for x in groups)):
+                    groups[g].append(team); nations_by_g[g].add(nat); placed=True; break
+            if not placed:
+                g = min(groups.keys(), key=lambda k: len(groups[k]))
+                groups[g].append(team); nations_by_g[g].add(nat)
+    def group_fixtures(teams, weeks):
+        pairs_rounds = [
+            [(teams[0],teams[1]),(teams[2],teams[3])],
+            [(teams[0],teams[2]),(teams[1],teams[3])],
+            [(teams[0],teams[3]),(teams[1],teams[2])]
+        ]
+        fixtures=[]
+        for r, pairs in enumerate(pairs_rounds):
+            w = weeks[r]
+            for (h,a) in pairs:
+                fixtures.append({"week":w,"round":"G","home":h,"away":a})
+        for r, pairs in enumerate(pairs_rounds):
+            w = weeks[r+3]
+            for (h,a) in pairs:
+                fixtures.append({"week":w,"round":"G","home":a,"away":h})
+        return fixtures
+    fixtures=[]
+    for g, teams in groups.items():
+        fixtures += [dict(x, group=g) for x in group_fixtures(teams, CC_WEEKS_GROUP)]
+    def blank_table(ts):
+        return pd.DataFrame([{"Club":t,"P":0,"W":0,"D":0,"L":0,"GF":0,"GA":0,"GD":0,"Pts":0} for t in ts]).set_index("Club")
+    tables = {g: blank_table(t) for g,t in groups.items()}
+    D["cc"] = {"groups": groups,"fixtures": fixtures,"by_week": index_fixtures(fixtures),"tables": tables,"results": [],"state": "GROUP"}
+    D.touch("cc")
+
+def ensure_continental_groups(D:GameState):
+    """大陸大会の組分けはシーズンごとに1回"""
+    D.ensure("continental_groups", D["season"], lambda: init_continental_groups_for_season(D))
+
+def _cc_apply_result(D:GameState, group:str, res:dict):
+    tb = D["cc"]["tables"][group]
+    h,a,gh,ga = res["home"], res["away"], res["gh"], res["ga"]
+    for club, gf, ga_ in [(h, gh, ga), (a, ga, gh)]:
+        tb.at[club, "P"]  = int(tb.at[club, "P"]) + 1
+        tb.at[club, "GF"] = int(tb.at[club, "GF"]) + int(gf)
+        tb.at[club, "GA"] = int(tb.at[club, "GA"]) + int(ga_)
+        tb.at[club, "GD"] = int(tb.at[club, "GF"]) - int(tb.at[club, "GA"])
+    if gh > ga:
+        tb.at[h,"W"] += 1; tb.at[a,"L"] += 1; tb.at[h,"Pts"] += 3
+    elif gh < ga:
+        tb.at[a,"W"] += 1; tb.at[h,"L"] += 1; tb.at[a,"Pts"] += 3
+    else:
+        tb.at[h,"D"] += 1; tb.at[a,"D"] += 1; tb.at[h,"Pts"] += 1; tb.at[a,"Pts"] += 1
+
+def _cc_h2h_metrics(D:GameState, group:str, clubs:list) -> dict:
+    pts = {c:0 for c in clubs}; gd={c:0 for c in clubs}; gf={c:0 for c in clubs}
+    for r in D["cc"]["results"]:
+        if r["round"]!="G" or r.get("group")!=group: continue
+        h,a,gh,ga = r["home"], r["away"], int(r["gh"]), int(r["ga"])
+        if h in clubs and a in clubs:
+            if gh>ga: pts[h]+=3
+            elif gh<ga: pts[a]+=3
+            else: pts[h]+=1; pts[a]+=1
+            gd[h]+= (gh-ga); gd[a]+= (ga-gh)
+            gf[h]+= gh; gf[a]+= ga
+    return {c:(pts[c], gd[c], gf[c]) for c in clubs}
+
+def _cc_group_rank(D:GameState, group:str) -> pd.DataFrame:
+    """グループの順位（勝点 → 得失点 → 得点、同勝点は直接対決）。cc の版が変わるまで使い回すので変更しないこと"""
+    return D.cached(f"cc_group_rank_{group}", D.version("cc"), lambda: _build_cc_group_rank(D, group))
+
+def _build_cc_group_rank(D:GameState, group:str) -> pd.DataFrame:
+    tb = D["cc"]["tables"][group].copy()
+    tb = tb.sort_values(["Pts","GD","GF"], ascending=[False,False,False])
+    ordered = []; clubs = tb.index.tolist(); i=0
+    while i < len(clubs):
+        same = [clubs[i]]; j=i+1
+        while j < len(clubs) and tb.loc[clubs[j],"Pts"] == tb.loc[clubs[i],"Pts"]:
+            same.append(clubs[j]); j+=1
+        if len(same)==1: ordered += same
+        else:
+            h2h = _cc_h2h_metrics(D, group, same)
+            same_sorted = sorted(
+                same,
+                key=lambda c: (h2h[c][0], h2h[c][1], h2h[c][2], tb.loc[c,"GD"], tb.loc[c,"GF"]),
+                reverse=True
+            )
+            ordered += same_sorted
+        i = j
+    return tb.loc[ordered]
+
+def _cc_seed_knockout_from_groups(D:GameState):
+    winners = {g: _cc_group_rank(D, g).head(1).index[0] for g in "ABCD"}
+    sf = [
+        {"week":CC_SF_LEGS[0], "round":"SF", "home": winners["A"], "away": winners["D"], "group":None, "slot":"SF1", "leg":1},
+        {"week":CC_SF_LEGS[1], "round":"SF", "home": winners["D"], "away": winners["A"], "group":None, "slot":"SF1", "leg":2},
+        {"week":CC_SF_LEGS[0], "round":"SF", "home": winners["B"], "away": winners["C"], "group":None, "slot":"SF2", "leg":1},
+        {"week":CC_SF_LEGS[1], "round":"SF", "home": winners["C"], "away": winners["B"], "group":None, "slot":"SF2", "leg":2},
+    ]
+    fin = [{"week":CC_WEEK_FINAL, "round":"F", "home":"WSF1", "away":"WSF2", "group":None, "slot":"F1", "leg":1}]
+    D["cc"]["fixtures"] += sf + fin
+    D["cc"]["by_week"] = index_fixtures(D["cc"]["fixtures"])
+    D["cc"]["state"] = "KO"
+    D.touch("cc")
+
+def _cc_resolve_placeholder(name:str, winners:dict) -> str:
+    if isinstance(name,str) and name.startswith("WSF"):
+        return winners.get(name, name)
+    return name
+
+def simulate_continental_week(D:GameState, wk:int):
+    if "cc" not in D or not D["cc"]: return
+    cc = D["cc"]
+    todays = cc_week_fixtures(D, wk)
+    if not todays: return
+    winners_map = {}
+    for r in cc["results"]:
+        if r["round"]=="SF" and r.get("winner"):
+            winners_map["WSF1" if r["slot"]=="SF1" else "WSF2"] = r["winner"]
+    playable = []
+    for fx in todays:
+        home = _cc_resolve_placeholder(fx.get("home"), winners_map)
+        away = _cc_resolve_placeholder(fx.get("away"), winners_map)
+        if not isinstance(home,str) or not isinstance(away,str) or home.startswith("W") or away.startswith("W"):
+            continue
+        playable.append((fx, home, away))
+    # その週の試合はまとめて1回でシミュレート（準決と決勝は別の週なので組み合わせは先に確定する）
+    sims = simulate_round(D, [{"home": h, "away": a} for _, h, a in playable])
+    if playable: D.touch("cc")
+    for (fx, home, away), res in zip(playable, sims):
+        if fx["round"]=="G":
+            winner = None if res["gh"]==res["ga"] else (home if res["gh"]>res["ga"] else away)
+            if winner == USER_CLUB:
+                D["budget"] += 200_000; log_finance(D, +200_000, "CC Group win bonus")
+            elif res["gh"]==res["ga"] and (home==USER_CLUB or away==USER_CLUB):
+                D["budget"] += 100_000; log_finance(D, +100_000, "CC Group draw bonus")
+            _cc_apply_result(D, fx["group"], {"home":home,"away":away,"gh":res["gh"],"ga":res["ga"]})
+            cc["results"].append({"week": wk, "round":"G", "group": fx.get("group"),
+                                  "home": home, "away": away, "gh": int(res["gh"]), "ga": int(res["ga"]),
+                                  "winner": winner, "slot": None, "leg": None})
+        elif fx["round"]=="SF":
+            slot = fx["slot"]; leg = fx.get("leg",1)
+            if leg == 1:
+                cc["results"].append({"week": wk, "round":"SF", "group": None, "slot": slot, "leg": 1,
+                                      "home": home, "away": away, "gh": int(res["gh"]), "ga": int(res["ga"]),
+                                      "winner": None, "agg_h": int(res["gh"]), "agg_a": int(res["ga"])})
+            else:
+                first = next(r for r in cc["results"] if r["round"]=="SF" and r["slot"]==slot and r.get("leg")==1)
+                agg_h = first["gh"] + res["ga"]
+                agg_a = first["ga"] + res["gh"]
+                if agg_h == agg_a:
+                    if D.rng("match").random()<0.5: agg_h += 1
+                    else: agg_a += 1
+                winner = first["home"] if agg_h > agg_a else first["away"]
+                if winner == USER_CLUB:
+                    D["budget"] += 1_200_000; log_finance(D, +1_200_000, "CC SF win bonus")
+                cc["results"].append({"week": wk, "round":"SF", "group": None, "slot": slot, "leg": 2,
+                                      "home": home, "away": away, "gh": int(res["gh"]), "ga": int(res["ga"]),
+                                      "winner": winner, "agg_h": int(agg_h), "agg_a": int(agg_a)})
+                winners_map["WSF1" if slot=="SF1" else "WSF2"] = winner
+        else:
+            if res["gh"] == res["ga"]:
+                if D.rng("match").random()<0.5: res["gh"]+=1
+                else: res["ga"]+=1
+            winner = home if res["gh"]>res["ga"] else away
+            if winner == USER_CLUB:
+                D["budget"] += 3_000_000; log_finance(D, +3_000_000, "CC Final win bonus")
+            cc["results"].append({"week": wk, "round":"F", "group": None, "slot":"F1", "leg":1,
+                                  "home": home, "away": away, "gh": int(res["gh"]), "ga": int(res["ga"]),
+                                  "winner": winner})
+
+# ============================================
+# Weekly Flow
+# ============================================
+def play_week(D:GameState, log_results:bool=True) -> List[dict]:
+    """1週進める。戻り値はその週のリーグ戦の結果（home / away / gh / ga）
+
+    log_results=False なら表示用の results_by_week（文字列）を作らない（早送り用）。
+    各ステージは D.profiler.stage() で囲み、所要時間と対象行数を記録する。
+    """
+    prof = D.profiler
+    prof.begin_week(D["season"], D["week"])
+    n_players = len(D["players"])
+    with prof.stage("sponsors", len(D.get("sponsors_active", []))):
+        apply_sponsor_income(D)
+    with prof.stage("staff_costs", len(D.get("scouts", []))):
+        apply_staff_weekly_costs(D)
+    with prof.stage("wages", len(D.club_rows(D["club_name"]))):
+        apply_player_wages_weekly(D)
+    with prof.stage("installments", len(D["installment_out"]) + len(D["installment_in"])):
+        apply_installments_this_week(D)
+    with prof.stage("loans"):
+        loan_weekly_tick(D)
+
+    wk = D["week"]
+    this_round = week_fixtures(D, wk)
+    with prof.stage("league_round", len(this_round)):
+        results = simulate_round(D, this_round, gate=False)
+        for div in dict.fromkeys(m["div"] for m in this_round):
+            rs = [r for m, r in zip(this_round, results) if m["div"] == div]
+            # ユーザーのホーム戦の観客数は、同じ週でそれより前の試合だけを反映した順位で出す（1試合ずつ進めていた頃と同じ）
+            k = next((i for i, r in enumerate(rs) if r["home"] == USER_CLUB), len(rs))
+            tbl = D["standings"][div]
+            tbl.apply_results([r["home"] for r in rs[:k]], [r["away"] for r in rs[:k]],
+                              [r["gh"] for r in rs[:k]], [r["ga"] for r in rs[:k]])
+            if k < len(rs):
+                gate_income(D, rs[k]["home"], rs[k]["away"])
+                tbl.apply_results([r["home"] for r in rs[k:]], [r["away"] for r in rs[k:]],
+                                  [r["gh"] for r in rs[k:]], [r["ga"] for r in rs[k:]])
+        if this_round: D.touch("standings")
+        if log_results and results:
+            D["results_by_week"][wk] = [f"{m['div']}  {r['home']} {r['gh']}-{r['ga']} {r['away']}"
+                                        for m, r in zip(this_round, results)]
+
+    with prof.stage("continental", len(cc_week_fixtures(D, wk))):
+        simulate_continental_week(D, wk)
+    with prof.stage("scouting", sum(int(s["coverage"]) for s in D.get("scouts", []))):
+        scouting_weekly_tick(D)
+    with prof.stage("mentoring", len(D.get("mentoring_pairs", []))):
+        apply_mentoring_weekly(D)
+    with prof.stage("growth", n_players + len(D.get("academy", ()))):
+        apply_growth_weekly(D)
+    with prof.stage("training", len(D.get("training_plans", {}))):
+        apply_training_weekly(D)
+    with prof.stage("cpu_offers", len(D.club_rows(D["club_name"]))):
+        generate_cpu_offers_for_your_players(D)
+    with prof.stage("resale", n_players):
+        simulate_cpu_resale(D)
+    with prof.stage("rumors", n_players):
+        generate_rumors_weekly(D)
+
+    D["week"] += 1
+    if D["week"] > season_weeks(D):
+        with prof.stage("season_end_sponsors"):
+            sponsor_on_season_end(D)
+        with prof.stage("promote_relegate", len(D["club_meta"])):
+            _promote_relegate(D)
+        D["season"] += 1
+        D["week"] = 1
+        with prof.stage("continental_groups", CC_TEAMS):
+            ensure_continental_groups(D)
+        log_finance(D, 0, "Season ended: Promotion/Relegation & new Cup seeded")
+        with prof.stage("youth_intake"):
+            youth_intake(D)
+    prof.end_week()
+    return results
+
+def weeks_until(D:GameState, week:Optional[int]=None, seasons:int=0) -> int:
+    """早送りする週数：week 指定なら今季の第 week 週まで、seasons 指定ならその数のシーズン終了まで"""
+    n = season_weeks(D)
+    if seasons:
+        return (n - D["week"] + 1) + (seasons - 1) * n
+    if week is None:
+        return 0
+    return max(0, min(int(week), n) - D["week"])
+
+def play_weeks(D:GameState, n:int, on_week=None) -> int:
+    """n 週まとめて進める（早送り）。進めた週数を返す
+
+    途中の週は results_by_week を作らず、最後の週だけ表示用に残す。
+    on_week(i, n) を毎週呼び、False を返したらそこで止める。
+    """
+    for i in range(n):
+        play_week(D, log_results=(i == n - 1))
+        if on_week is not None and on_week(i + 1, n) is False:
+            return i + 1
+    return n
+
+def prepare_state(D:GameState):
+    """初期化チェーン（UI・バッチ共通）"""
+    init_league(D)
+    ensure_ticket_price(D)
+    ensure_sponsor_state(D)
+    ensure_continental_groups(D)
+    ensure_scouting_state(D)
+    ensure_scout_reports(D)
+    ensure_registration_rules(D)
+    ensure_contract_state(D)
+    # 選手テーブル全体を見るステップはロスター更新時だけ
+    D.ensure("player_wages", D.version("roster"), lambda: ensure_player_wages(D))
+    D.ensure("player_nations_and_hg", D.version("roster"), lambda: ensure_player_nations_and_hg(D))
+    ensure_rights_state(D)
+    ensure_news_state(D)
+
+def new_game(config:Optional[dict]=None, seed=None) -> GameState:
+    """init_session + prepare_state"""
+    D = init_session(config, seed)
+    prepare_state(D)
+    return D
+
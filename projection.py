@@ -0,0 +1,103 @@
+# projection.py — Monte Carlo season projection
+# ------------------------------------------------------------
+# 現在の順位表と残り日程から、シーズン残りを NumPy で一括シミュレート。
+# 試合モデルは engine.simulate_round と同じ Poisson（fixture_lambdas）。
+# 乱数は D.rng("projection")（seed 指定時はその場の Generator）を使うので、本編の乱数列には影響しない。
+# 試行回数はディビジョンごとに「試行 × 残り試合」が SIM_BUDGET に収まるよう減らす（大きなリーグでも描画を止めない）。
+# budget=None なら減らさず n_sims 回（UI では明示的に選んだときだけ）。
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from engine import _strength_key, continental_entrants, division_slots, fixture_lambdas
+from state import GameState
+
+SIM_BUDGET = 1_000_000      # 1ディビジョンあたりの試合シミュレーション数（n_sims × 残り試合）の上限
+MIN_SIMS = 1_000
+
+
+def sims_for(n_fixtures:int, n_sims:int=10_000, budget:Optional[int]=SIM_BUDGET) -> int:
+    """残り試合数に応じた試行回数（n_sims を上限、MIN_SIMS を下限。budget=None なら常に n_sims）"""
+    if budget is None:
+        return int(n_sims)
+    return int(min(n_sims, max(MIN_SIMS, budget // max(1, n_fixtures))))
+
+
+def _final_ranks(D:GameState, div:str, fixtures:list, n_sims:int, rng:np.random.Generator):
+    """div の最終順位（0始まり）を返す — shape (n_sims, クラブ数)"""
+    tbl = D["standings"][div]
+    clubs = tbl.clubs
+    n = len(clubs)
+    # 集計は float（整数値のまま BLAS の行列積に乗せる）
+    pts = np.tile(tbl["Pts"].astype(float), (n_sims, 1))
+    gf  = np.tile(tbl["GF"].astype(float), (n_sims, 1))
+    gd  = np.tile(tbl["GD"].astype(float), (n_sims, 1))
+    if fixtures:
+        pos = tbl.pos
+        hi = np.array([pos[m["home"]] for m in fixtures]); ai = np.array([pos[m["away"]] for m in fixtures])
+        lam = fixture_lambdas(D, [m["home"] for m in fixtures], [m["away"] for m in fixtures])
+        g = rng.poisson(lam, size=(n_sims, len(fixtures), 2)).astype(float)
+        gh, ga = g[..., 0], g[..., 1]
+        hp = np.where(gh > ga, 3.0, np.where(gh == ga, 1.0, 0.0))
+        ap = np.where(ga > gh, 3.0, np.where(gh == ga, 1.0, 0.0))
+        # 試合 → クラブの対応行列で一括加算
+        H = np.zeros((len(fixtures), n)); H[np.arange(len(fixtures)), hi] = 1
+        A = np.zeros((len(fixtures), n)); A[np.arange(len(fixtures)), ai] = 1
+        pts += hp @ H + ap @ A
+        gf  += gh @ H + ga @ A
+        gd  += (gh - ga) @ H + (ga - gh) @ A
+    # Pts → GD → GF の順（同点は順位表の並び順）
+    key = (pts * 100_000 + (gd + 50_000)) * 10_000 + gf
+    order = np.argsort(-key, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n)[None, :], axis=1)
+    return clubs, pts, ranks
+
+
+def project_season(D:GameState, n_sims:int=10_000, seed:Optional[int]=None,
+                   divs:Optional[Iterable[str]]=None, budget:Optional[int]=SIM_BUDGET) -> pd.DataFrame:
+    """残りシーズンをシミュレートし、クラブ別の確率表を返す（divs=None なら全ディビジョン）
+
+    試行回数はディビジョンごとに sims_for(残り試合数, n_sims, budget)。実際の回数は Sims 列。
+    ContinentalSlot は確率ではなく、現行ルール（人気順の出場枠）で出場が決まっているかどうか。
+    """
+    rng = D.rng("projection") if seed is None else np.random.default_rng(seed)
+    remaining = [m for m in D.get("fixtures", []) if m["week"] >= D["week"]]
+    names = list(D["divisions"].keys())         # 上位リーグから順
+    targets = names if divs is None else [d for d in names if d in set(divs)]
+    entrants = set(continental_entrants(D))
+    rows = []
+    for div in targets:
+        d_i = names.index(div)
+        fx = [m for m in remaining if m["div"] == div]
+        sims = sims_for(len(fx), n_sims, budget)
+        clubs, pts, ranks = _final_ranks(D, div, fx, sims, rng)
+        n = len(clubs)
+        up, down = division_slots(D, d_i)
+        title = (ranks == 0).mean(axis=0)
+        promo = (ranks < up).mean(axis=0)
+        releg = (ranks >= n - down).mean(axis=0) if down else np.zeros(n)
+        for i, c in enumerate(clubs):
+            rows.append({
+                "Div": div, "Club": c,
+                "Pts": int(D["standings"][div]["Pts"][i]),
+                "xPts": float(pts[:, i].mean()),
+                "xRank": float(ranks[:, i].mean() + 1),
+                "Title": float(title[i]), "Promotion": float(promo[i]), "Relegation": float(releg[i]),
+                # 現行の出場枠は人気順（成績に依存しない）ので、シミュレーションではなくルールで決まる
+                "ContinentalSlot": c in entrants,
+                "Sims": sims,
+            })
+    return pd.DataFrame(rows).sort_values(["Div", "xRank"]).reset_index(drop=True)
+
+
+def cached_projection(D:GameState, div:str, n_sims:int=10_000, full:bool=False) -> pd.DataFrame:
+    """UI 用：表示中の1ディビジョンだけ。週・ロスター・能力値・戦術が変わるまで結果を使い回す
+
+    full=True なら SIM_BUDGET で減らさず n_sims 回（大きなディビジョンでは秒単位かかる）。
+    """
+    key = (D["season"], D["week"], div, n_sims, full, _strength_key(D), D.version("tactics"))
+    budget = None if full else SIM_BUDGET
+    return D.cached(f"projection_{div}", key, lambda: project_season(D, n_sims, divs=[div], budget=budget))
@@ -0,0 +1,686 @@
+# state.py — GameState（Streamlit 非依存のゲーム状態）
+# ------------------------------------------------------------
+# 従来の st.session_state.data をそのまま置き換える dict。
+# engine.py の関数はすべてこれを第1引数 D として受け取る。
+
+import json
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# 選手を保持するテーブル（ID 索引の検索順）
+PLAYER_TABLES = ("players", "free_agents", "academy")
+
+# 選手テーブルの列型（整数は値域に合わせた幅。カテゴリ列の候補はゲームごとに set_player_schema で与える）
+PLAYER_INT_DTYPES = {
+    "ID": "int64", "MV": "int32",
+    "OV": "int8", "POT": "int8", "Age": "int8", "SPD": "int8", "DEF": "int8", "FIN": "int8",
+    "Morale": "int8", "HGYearsClub": "int8",
+    "Apps": "int16", "Goals": "int16", "LoanAppearances": "int16",
+}
+PLAYER_CATEGORY_COLS = ("Club", "Nat", "Pos", "Growth", "LoanFrom")
+
+# 乱数ストリーム（サブシステムごとに独立した Generator。順番を変えると既存シードの結果が変わる）
+RNG_STREAMS = ("world", "match", "growth", "scouting", "market", "youth", "news", "projection")
+
+
+class GameState(dict):
+    """1ゲーム分の状態（D["players"], D["standings"] ... をそのまま保持）
+
+    選手ID索引（ID → テーブル名 + 行ラベル）とクラブ別ロスター索引も持つ。
+    テーブルが丸ごと差し替えられた場合は次の検索時に作り直す。
+    選手の追加・削除は追記バッファと削除印（tombstone）に積み、次にそのテーブルを読むときに1回でまとめる。
+    乱数は RNG_STREAMS ごとの np.random.Generator を D.rng(name) で引く。
+    """
+
+    _journal = {}       # unpickle 中（__dict__ の復元前）に参照される空の既定値。書き換えない
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pid_label = {tb: {} for tb in PLAYER_TABLES}   # table -> {pid: label}
+        self._pid_synced = {}                                # table -> 索引作成元の DataFrame
+        self._versions = {}                                  # name -> 更新カウンタ
+        self._club_rows = (None, -1, {})                     # (players, roster版, {club: labels})
+        self.cache = DerivedCache()                          # 派生データ（版キー付き LRU）
+        self._ensured = {}                                   # 初期化ステップ -> 実行時の入力キー
+        self._rng = {}                                       # ストリーム名 -> Generator
+        self.rng_seed = None                                 # SeedSequence のエントロピー（再現用）
+        self.profiler = StageProfiler()                      # play_week のステージ別計測
+        self.player_dtypes = {}                              # 列 -> dtype（set_player_schema まで変換しない）
+        self._journal = {}                                   # table -> 未反映の追加・削除（_compact で反映）
+        self._next_label = {}                                # table -> 次に振る行ラベル（減らさない）
+
+    def __getitem__(self, key):
+        if self._journal and key in self._journal:
+            self._compact(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if self._journal and key in self._journal:
+            self._compact(key)
+        return dict.get(self, key, default)
+
+    # 値をまとめて読む dict のメソッドも、未反映の追加・削除を先に反映する（pickle / dict(D) / copy 含む）
+    def _compact_all(self):
+        for table in list(self._journal):
+            self._compact(table)
+
+    def __iter__(self):
+        self._compact_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self._compact_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._compact_all()
+        return dict.values(self)
+
+    def items(self):
+        self._compact_all()
+        return dict.items(self)
+
+    def copy(self) -> dict:
+        self._compact_all()
+        return dict.copy(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if self._journal and key in self._journal:
+            self._compact(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._compact_all()
+        return dict.popitem(self)
+
+    def __delitem__(self, key):
+        self._journal.pop(key, None)
+        dict.__delitem__(self, key)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        # 選手テーブルの丸ごと差し替え（unpickle 中は __dict__ がまだ無い）
+        if key in PLAYER_TABLES and "_versions" in self.__dict__:
+            self._journal.pop(key, None)
+            self._changed(key)
+
+    def _changed(self, table:str):
+        self.touch(table)
+        if table == "players":
+            self.touch("roster")
+
+    # ---------- バージョン ----------
+    def touch(self, *names:str):
+        """派生データのキャッシュを無効化するためにカウンタを進める"""
+        for n in names:
+            self._versions[n] = self._versions.get(n, 0) + 1
+
+    def version(self, name:str) -> int:
+        return self._versions.get(name, 0)
+
+    def cached(self, name:str, key, build):
+        """key（版カウンタの組など）が変わるまで build() の結果を使い回す"""
+        return self.cache.get(name, key, build)
+
+    def ensure(self, step:str, key, run):
+        """初期化ステップ：入力 key が前回の実行時から変わったときだけ run() する"""
+        if step in self._ensured and self._ensured[step] == key:
+            return
+        run()
+        self._ensured[step] = key
+
+    # ---------- 乱数 ----------
+    def seed_rng(self, seed:Union[int, np.random.SeedSequence, None]=None):
+        """全ストリームを seed から作り直す（None なら OS のエントロピー）
+
+        ストリームは SeedSequence.spawn で分けるので互いに独立。
+        並列ワーカーには親の SeedSequence.spawn() で得た子をそのまま渡せばよい。
+        """
+        ss = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng_seed = ss.entropy
+        self._rng = {name: np.random.default_rng(child)
+                     for name, child in zip(RNG_STREAMS, ss.spawn(len(RNG_STREAMS)))}
+
+    def rng(self, name:str) -> np.random.Generator:
+        """サブシステム name の Generator（未シードなら OS のエントロピーでシード）"""
+        if not getattr(self, "_rng", None):
+            self.seed_rng()
+        return self._rng[name]
+
+    # ---------- 選手テーブルの列型 ----------
+    def set_player_schema(self, **categories):
+        """列型を決めて既存の選手テーブルを変換する（categories: 列名 → 取りうる値、Pos の順が PosRoles のビット順）"""
+        dtypes = {col: np.dtype(dt) for col, dt in {**PLAYER_INT_DTYPES, "OnLoan": "bool", "PosRoles": "uint16"}.items()}
+        for col in PLAYER_CATEGORY_COLS:
+            # 候補は object の Index（str 型だと get_indexer のたびに候補全体を変換する）
+            dtypes[col] = pd.CategoricalDtype(pd.Index(list(categories[col]), dtype=object))
+        self.player_dtypes = dtypes
+        for tb in PLAYER_TABLES:
+            if self.get(tb) is not None:
+                self[tb] = self.conform(self[tb])
+
+    @property
+    def positions(self) -> list:
+        return list(self.player_dtypes["Pos"].categories)
+
+    def conform(self, df:pd.DataFrame) -> pd.DataFrame:
+        """df を選手テーブルの列型にそろえる（PosRoles のリストはビットマスクへ）。候補にない値は ValueError"""
+        if not self.player_dtypes:
+            return df
+        out = {}
+        cur = df.dtypes
+        for col, dt in self.player_dtypes.items():
+            # カテゴリ型の == は候補の比較になるので、同じ dtype オブジェクトなら先に抜ける
+            # （numpy の dtype は unpickle 後に別オブジェクトになるので == で比べる）
+            if col not in cur or cur[col] is dt or cur[col] == dt:
+                continue
+            vals = df[col].to_numpy()
+            if col == "PosRoles" and vals.dtype == object:
+                pos = self.positions
+                vals = np.array([roles_to_mask(r, pos) if isinstance(r, (list, tuple, set)) else r for r in vals])
+            if isinstance(dt, pd.CategoricalDtype):
+                codes = dt.categories.get_indexer(vals)
+                bad = (codes < 0) & ~pd.isna(vals)
+                if bad.any():
+                    raise ValueError(f"{col}: unknown value(s) {sorted(set(vals[bad]))[:5]}")
+                out[col] = pd.Categorical.from_codes(codes, dtype=dt)
+            else:
+                out[col] = vals.astype(dt)
+        if not out:
+            return df
+        # 変換しない列は .array のまま渡す（to_numpy だとカテゴリ列が object に戻る）
+        return pd.DataFrame({c: out[c] if c in out else df[c].array for c in df.columns}, index=df.index)
+
+    def roles_mask(self, roles:Iterable[str]) -> int:
+        return roles_to_mask(roles, self.positions)
+
+    def roles(self, mask:int) -> list:
+        return mask_to_roles(mask, self.positions)
+
+    def memory_report(self) -> pd.DataFrame:
+        """選手テーブルの列ごとのメモリ（KB）。plain_kb は文字列・int64・リストのままだった場合"""
+        rows = []
+        for tb in PLAYER_TABLES:
+            df = self.get(tb)
+            if df is None:
+                continue
+            now = df.memory_usage(deep=True, index=False)
+            plain = plain_players(df, self.positions if self.player_dtypes else None).memory_usage(deep=True, index=False)
+            rows += [{"table": tb, "column": col, "dtype": str(df[col].dtype), "rows": len(df),
+                      "kb": now[col] / 1024, "plain_kb": plain[col] / 1024} for col in df.columns]
+        return pd.DataFrame(rows, columns=["table", "column", "dtype", "rows", "kb", "plain_kb"])
+
+    # ---------- 選手ID索引 ----------
+    def _sync_table(self, table:str) -> dict:
+        df = super().get(table)             # 未反映の追加・削除は索引側に反映済み
+        if df is not self._pid_synced.get(table):
+            if df is None or df.empty:
+                self._pid_label[table] = {}
+            else:
+                self._pid_label[table] = dict(zip(df["ID"].astype(int).tolist(), df.index.tolist()))
+            self._pid_synced[table] = df
+        return self._pid_label[table]
+
+    def locate_player(self, pid:int, tables:Iterable[str]=PLAYER_TABLES) -> Optional[Tuple[str, object]]:
+        """pid → (テーブル名, 行ラベル)。見つからなければ None"""
+        pid = int(pid)
+        for tb in tables:
+            lab = self._sync_table(tb).get(pid)
+            if lab is not None:
+                return tb, lab
+        return None
+
+    def player_label(self, pid:int, table:str="players"):
+        """指定テーブル内の行ラベル（なければ None）"""
+        return self._sync_table(table).get(int(pid))
+
+    def player_row(self, pid:int, tables:Iterable[str]=PLAYER_TABLES) -> Optional[pd.Series]:
+        loc = self.locate_player(pid, tables)
+        if loc is None:
+            return None
+        return self[loc[0]].loc[loc[1]]
+
+    def _journal_for(self, table:str) -> dict:
+        """未反映の変更：new = 追加分のチャンク（DataFrame か [(label, dict), ...]）、dead = 削除印のラベル"""
+        j = self._journal.get(table)
+        if j is None:
+            df = super().get(table)
+            start = 0 if df is None or df.empty else int(df.index.max()) + 1
+            # 最大ラベルの行が削除・反映済みでも、そのラベルを再利用しない
+            start = self._next_label[table] = max(start, self._next_label.get(table, 0))
+            j = self._journal[table] = {"new": [], "dead": set(), "next": start}
+        return j
+
+    def _check_categories(self, rows:list):
+        for col in PLAYER_CATEGORY_COLS:
+            dt = self.player_dtypes.get(col)
+            if dt is None:
+                continue
+            bad = {r[col] for r in rows if col in r and not pd.isna(r[col]) and r[col] not in dt.categories}
+            if bad:
+                raise ValueError(f"{col}: unknown value(s) {sorted(bad)[:5]}")
+
+    def append_players(self, table:str, rows:Union[list, pd.DataFrame]):
+        """テーブル末尾に選手を追加（既存行のラベルは変えない）
+
+        行は追記バッファに積むだけで、DataFrame への変換とテーブルのコピーは次に読むときの1回。
+        """
+        if len(rows) == 0:
+            return
+        ids = self._sync_table(table)
+        j = self._journal_for(table)
+        labels = range(j["next"], j["next"] + len(rows))
+        j["next"] += len(rows)
+        self._next_label[table] = j["next"]
+        if isinstance(rows, pd.DataFrame):
+            new = self.conform(rows).set_axis(pd.RangeIndex(labels.start, labels.stop))
+            j["new"].append(new)
+            pids = new["ID"].astype(int).tolist()
+        else:
+            rows = [dict(r) for r in rows]
+            self._check_categories(rows)
+            if not j["new"] or isinstance(j["new"][-1], pd.DataFrame):
+                j["new"].append([])
+            j["new"][-1].extend(zip(labels, rows))
+            pids = [int(r["ID"]) for r in rows]
+        ids.update(zip(pids, labels))
+        self._changed(table)
+
+    def remove_player(self, table:str, pid:int) -> Optional[pd.Series]:
+        """テーブルから選手を外して、その行を返す（行は削除印を付けるだけ）"""
+        ids = self._sync_table(table)
+        lab = ids.pop(int(pid), None)
+        if lab is None:
+            return None
+        j = self._journal_for(table)
+        df = super().get(table)
+        if df is not None and lab in df.index:
+            row = df.loc[lab]
+        else:
+            row = next(self._pending_row(chunk, lab) for chunk in j["new"] if self._pending_row(chunk, lab) is not None)
+        j["dead"].add(lab)
+        self._changed(table)
+        return row
+
+    @staticmethod
+    def _pending_row(chunk, lab) -> Optional[pd.Series]:
+        if isinstance(chunk, pd.DataFrame):
+            return chunk.loc[lab] if lab in chunk.index else None
+        return next((pd.Series(r, name=l) for l, r in chunk if l == lab), None)
+
+    def _compact(self, table:str):
+        """追記バッファを連結し、削除印の行を落とす（索引のラベルは変わらない）"""
+        j = self._journal.pop(table)
+        df = super().get(table)
+        if j["new"]:
+            chunks = [c if isinstance(c, pd.DataFrame)
+                      else self.conform(pd.DataFrame([r for _, r in c], index=pd.Index([l for l, _ in c])))
+                      for c in j["new"]]
+            new = pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+            if df is None or df.empty:
+                df = new if df is None else new.reindex(columns=df.columns.union(new.columns, sort=False))
+            else:
+                df = pd.concat([df, new])
+        if j["dead"]:
+            df = df.drop(index=list(j["dead"]))
+        super().__setitem__(table, df)
+        self._pid_synced[table] = df
+
+    # ---------- クラブ別ロスター索引 ----------
+    def club_rows(self, club:str) -> pd.Index:
+        """D["players"] のうち club 所属の行ラベル（Club 書き込みで無効化）"""
+        df = self["players"]
+        cached_df, ver, rows = self._club_rows
+        if cached_df is not df or ver != self.version("roster"):
+            rows = {c: df.index[pos] for c, pos in df.groupby("Club", sort=False).indices.items()}
+            self._club_rows = (df, self.version("roster"), rows)
+        return rows.get(club, df.index[:0])
+
+    def club_roster(self, club:str) -> pd.DataFrame:
+        return self["players"].loc[self.club_rows(club)]
+
+    def set_player_club(self, label, club:Optional[str]):
+        """所属クラブの書き込み口（ロスター索引を無効化）"""
+        self["players"].at[label, "Club"] = club
+        self.touch("roster")
+
+
+def roles_to_mask(roles:Iterable[str], positions:list) -> int:
+    """ポジションのリスト → ビットマスク（bit i = positions[i]）"""
+    mask = 0
+    for r in roles:
+        mask |= 1 << positions.index(r)
+    return mask
+
+
+def mask_to_roles(mask:int, positions:list) -> list:
+    return [p for i, p in enumerate(positions) if int(mask) >> i & 1]
+
+
+def plain_players(df:pd.DataFrame, positions:Optional[list]=None) -> pd.DataFrame:
+    """UI・外部出力向けに、カテゴリ → 文字列、整数 → int64、PosRoles → リストへ戻す"""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            out[col] = s.astype(s.cat.categories.dtype)
+        elif col == "PosRoles" and positions is not None and s.dtype.kind == "u":
+            out[col] = [mask_to_roles(m, positions) for m in s.to_numpy()]
+        elif s.dtype.kind in "iu":
+            out[col] = s.astype("int64")
+    return df.assign(**out) if out else df
+
+
+class DerivedCache:
+    """派生データの LRU キャッシュ（(name, key) 単位）
+
+    key には入力の版カウンタ（D.version(...)）の組を使う。入力が変われば key も変わるので、
+    古い値は name ごとに per_name 個、全体で maxsize 個を超えた分から追い出す。
+    name ごとにヒット・ミス・追い出し数と構築時間を数える（デバッグ表示用）。
+    """
+
+    def __init__(self, maxsize:int=64, per_name:int=2):
+        self.maxsize = maxsize
+        self.per_name = per_name
+        self._data = OrderedDict()                  # (name, key) -> value（古い順）
+        self._keys = {}                             # name -> [key, ...]（古い順）
+        self.stats = {}                             # name -> {"hits", "misses", "evictions", "build_ms"}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _stat(self, name:str) -> dict:
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = {"hits": 0, "misses": 0, "evictions": 0, "build_ms": 0.0}
+        return st
+
+    def get(self, name:str, key, build):
+        k = (name, key)
+        st = self._stat(name)
+        if k in self._data:
+            self._data.move_to_end(k)
+            st["hits"] += 1
+            return self._data[k]
+        st["misses"] += 1
+        t0 = time.perf_counter()
+        value = build()
+        st["build_ms"] += (time.perf_counter() - t0) * 1000
+        keys = self._keys.setdefault(name, [])
+        while len(keys) >= self.per_name:
+            self._evict((name, keys[0]))
+        self._data[k] = value
+        keys.append(key)
+        while len(self._data) > self.maxsize:
+            self._evict(next(iter(self._data)))
+        return value
+
+    def _evict(self, k):
+        name, key = k
+        del self._data[k]
+        self._keys[name].remove(key)
+        self.stats[name]["evictions"] += 1
+
+    def clear(self):
+        self._data.clear()
+        self._keys = {}
+
+    def frame(self) -> pd.DataFrame:
+        """name 別の統計（hits / misses / hit_rate / evictions / build_ms / entries）"""
+        rows = [{"name": name, **st, "hit_rate": st["hits"] / max(1, st["hits"] + st["misses"]),
+                 "entries": len(self._keys.get(name, ()))} for name, st in self.stats.items()]
+        return pd.DataFrame(rows, columns=["name", "hits", "misses", "hit_rate", "evictions", "build_ms", "entries"])
+
+
+class StageProfiler:
+    """play_week のステージ別計測（直近 maxlen 週分のリングバッファ）
+
+    1週分 = {"season", "week", "total_ms", "stages": {name: {"ms", "rows", "alloc_kb"}}}。
+    rows はそのステージが対象にした行数（選手・試合・契約など）。
+    alloc_kb（ステージ中の確保メモリのピーク）は track_alloc=True のときだけ tracemalloc で測る。
+    """
+
+    def __init__(self, maxlen:int=104):
+        self.weeks = deque(maxlen=maxlen)
+        self.enabled = True
+        self.track_alloc = False
+        self._cur = None
+
+    def begin_week(self, season:int, week:int):
+        if not self.enabled:
+            self._cur = None
+            return
+        self._cur = {"season": int(season), "week": int(week), "total_ms": 0.0, "stages": {}}
+        self._t0 = time.perf_counter()
+        if self.track_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name:str, rows:int=0):
+        cur = self._cur
+        if cur is None:
+            yield
+            return
+        alloc = self.track_alloc and tracemalloc.is_tracing()
+        if alloc:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            peak = (tracemalloc.get_traced_memory()[1] - base) / 1024 if alloc else None
+            cur["stages"][name] = {"ms": ms, "rows": int(rows), "alloc_kb": peak}
+
+    def end_week(self):
+        if self._cur is None:
+            return
+        self._cur["total_ms"] = (time.perf_counter() - self._t0) * 1000
+        self.weeks.append(self._cur)
+        self._cur = None
+        if not self.track_alloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def last(self) -> Optional[dict]:
+        return self.weeks[-1] if self.weeks else None
+
+    def frame(self) -> pd.DataFrame:
+        """週 × ステージの縦持ち表（season, week, stage, ms, rows, alloc_kb）"""
+        rows = [{"season": w["season"], "week": w["week"], "stage": name, **v}
+                for w in self.weeks for name, v in w["stages"].items()]
+        return pd.DataFrame(rows, columns=["season", "week", "stage", "ms", "rows", "alloc_kb"])
+
+    def summary(self) -> pd.DataFrame:
+        """ステージ別の集計（実行順、平均・p95・最大・直近）"""
+        df = self.frame()
+        if df.empty:
+            return pd.DataFrame(columns=["stage", "weeks", "mean_ms", "p95_ms", "max_ms", "last_ms", "rows", "alloc_kb"])
+        g = df.groupby("stage", sort=False)
+        out = pd.DataFrame({
+            "weeks": g.size(), "mean_ms": g["ms"].mean(), "p95_ms": g["ms"].quantile(0.95),
+            "max_ms": g["ms"].max(), "last_ms": g["ms"].last(), "rows": g["rows"].last(),
+            "alloc_kb": g["alloc_kb"].max(),
+        })
+        return out.reset_index()
+
+    def to_json(self) -> str:
+        return json.dumps({"track_alloc": self.track_alloc, "weeks": list(self.weeks)}, ensure_ascii=False, indent=1)
+
+    def dump(self, path:str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+class KnowledgeStore:
+    """スカウト知識（選手ごとの推定 OV）の列ストア
+
+    mu / sigma は float32、last_seen は int16 — 1選手あたり 10 バイト（＋ID 4 バイト）。
+    容量は倍々で確保し、ID → 行は pd.Index で引く（追加直後の分は _pending）。
+    """
+
+    def __init__(self, capacity:int=256):
+        self.n = 0
+        self._ids = np.zeros(capacity, dtype=np.int32)
+        self._mu = np.zeros(capacity, dtype=np.float32)
+        self._sigma = np.zeros(capacity, dtype=np.float32)
+        self._last_seen = np.zeros(capacity, dtype=np.int16)
+        self._index = pd.Index(self._ids[:0])
+        self._pending = {}                          # 索引未反映の pid -> 行
+
+    # 有効部分のビュー（書き込み可）
+    @property
+    def ids(self) -> np.ndarray: return self._ids[:self.n]
+    @property
+    def mu(self) -> np.ndarray: return self._mu[:self.n]
+    @property
+    def sigma(self) -> np.ndarray: return self._sigma[:self.n]
+    @property
+    def last_seen(self) -> np.ndarray: return self._last_seen[:self.n]
+
+    @property
+    def nbytes(self) -> int:
+        return self.n * (self._ids.itemsize + self._mu.itemsize + self._sigma.itemsize + self._last_seen.itemsize)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, pid) -> bool:
+        return self._slot(int(pid)) >= 0
+
+    def _slot(self, pid:int) -> int:
+        s = self._pending.get(pid)
+        if s is not None:
+            return s
+        s = self._index.get_indexer([pid])[0]
+        return int(s)
+
+    def _flush(self):
+        if self._pending:
+            self._index = pd.Index(self._ids[:self.n])
+            self._pending = {}
+
+    def slots(self, pids) -> np.ndarray:
+        """pid 配列 → 行番号配列（未登録は -1）"""
+        self._flush()
+        return self._index.get_indexer(np.asarray(pids, dtype=np.int64))
+
+    def _reserve(self, k:int):
+        need = self.n + k
+        if need <= len(self._ids):
+            return
+        cap = max(need, 2 * len(self._ids))
+        for name in ("_ids", "_mu", "_sigma", "_last_seen"):
+            old = getattr(self, name)
+            arr = np.zeros(cap, dtype=old.dtype); arr[:self.n] = old[:self.n]
+            setattr(self, name, arr)
+
+    def add(self, pids, mu, sigma, last_seen) -> np.ndarray:
+        """未登録の選手をまとめて追加して行番号を返す"""
+        pids = np.asarray(pids, dtype=np.int64)
+        k = len(pids)
+        self._reserve(k)
+        sl = np.arange(self.n, self.n + k)
+        self._ids[sl] = pids; self._mu[sl] = mu; self._sigma[sl] = sigma; self._last_seen[sl] = last_seen
+        self.n += k
+        if len(self._pending) + k > 1024:
+            self._index = pd.Index(self._ids[:self.n]); self._pending = {}
+        else:
+            self._pending.update(zip(pids.tolist(), sl.tolist()))
+        return sl
+
+    def set(self, pid:int, mu:float, sigma:float, last_seen:int):
+        s = self._slot(int(pid))
+        if s < 0:
+            self.add([pid], mu, sigma, last_seen)
+        else:
+            self._mu[s] = mu; self._sigma[s] = sigma; self._last_seen[s] = last_seen
+
+    def get(self, pid:int) -> Optional[dict]:
+        """1選手分のスナップショット（読み取り用）"""
+        s = self._slot(int(pid))
+        if s < 0:
+            return None
+        return {"mu": float(self._mu[s]), "sigma": float(self._sigma[s]), "last_seen": int(self._last_seen[s])}
+
+
+# 順位表の列（GD は GF - GA から都度計算）
+STANDINGS_COLS = ("P", "W", "D", "L", "GF", "GA", "Pts")
+
+
+class LeagueTable:
+    """1ディビジョンの順位表（クラブ × 列の int 配列）
+
+    結果は1節まとめて np.add.at で加算し、順位（Pts → GD → GF、同点は登録順）は
+    次に参照されたときに1回だけ並べ直してキャッシュする。
+    """
+
+    def __init__(self, clubs:Iterable[str]):
+        self.clubs = list(clubs)
+        self.pos = {c: i for i, c in enumerate(self.clubs)}
+        self.data = np.zeros((len(self.clubs), len(STANDINGS_COLS)), dtype=np.int64)
+        self._order = None          # 順位順のクラブ位置
+        self._rank = None           # クラブ位置 -> 順位（0始まり）
+        self._frames = {}           # "table" / "sorted" -> DataFrame
+
+    def __len__(self) -> int:
+        return len(self.clubs)
+
+    def __contains__(self, club) -> bool:
+        return club in self.pos
+
+    def __getitem__(self, col:str) -> np.ndarray:
+        if col == "GD":
+            return self["GF"] - self["GA"]
+        return self.data[:, STANDINGS_COLS.index(col)]
+
+    def apply_results(self, homes, aways, gh, ga):
+        """1節分の結果を一括加算（1試合につきホーム・アウェイ2行）"""
+        h = np.array([self.pos[c] for c in homes], dtype=np.intp)
+        a = np.array([self.pos[c] for c in aways], dtype=np.intp)
+        gh = np.asarray(gh, dtype=np.int64); ga = np.asarray(ga, dtype=np.int64)
+        gf = np.concatenate([gh, ga]); gag = np.concatenate([ga, gh])
+        win, draw, loss = gf > gag, gf == gag, gf < gag
+        delta = np.stack([np.ones_like(gf), win, draw, loss, gf, gag, 3*win + draw], axis=1)
+        np.add.at(self.data, np.concatenate([h, a]), delta)
+        self._order = self._rank = None
+        self._frames = {}
+
+    def order(self) -> np.ndarray:
+        """順位順に並べたクラブ位置"""
+        if self._order is None:
+            self._order = np.lexsort((-self["GF"], -self["GD"], -self["Pts"]))
+            self._rank = np.empty_like(self._order)
+            self._rank[self._order] = np.arange(len(self._order))
+        return self._order
+
+    def rank(self, club:str) -> Optional[int]:
+        """順位（1始まり）。所属していなければ None"""
+        i = self.pos.get(club)
+        if i is None:
+            return None
+        self.order()
+        return int(self._rank[i]) + 1
+
+    def ordered_clubs(self) -> list:
+        return [self.clubs[i] for i in self.order()]
+
+    def frame(self, sort:bool=False) -> pd.DataFrame:
+        """表示用 DataFrame（Club 索引、P W D L GF GA GD Pts）"""
+        name = "sorted" if sort else "table"
+        if name not in self._frames:
+            df = pd.DataFrame(self.data, columns=list(STANDINGS_COLS), index=pd.Index(self.clubs, name="Club"))
+            df.insert(6, "GD", df["GF"] - df["GA"])
+            self._frames[name] = df.iloc[self.order()] if sort else df
+        return self._frames[name]
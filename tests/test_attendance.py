@@ -0,0 +1,66 @@
+# demand_attendance の順位補正：既定の 2部 × 8クラブでは、クラブ数を 8 に固定していた旧式と同じ値になる
+import numpy as np
+import pytest
+
+import engine
+
+
+def _old_attendance(D, home, away, price, u):
+    """旧 demand_attendance（n = 8 固定、順位がなければ 8 位）。u は uniform(0.9, 1.05) の値"""
+    meta_h = D["club_meta"][home]; meta_a = D["club_meta"][away]
+    cap = 30000
+    allure = (meta_h["pop"]/100) * (0.8 + meta_a["pop"]/120)
+    price_factor = (price/meta_h["ticket"]) ** -0.35
+    div = "D1" if home in D["divisions"]["D1"] else "D2"
+    tbl = D["standings"][div]
+    rank_h, rank_a = tbl.rank(home) or 8, tbl.rank(away) or 8
+    rank_factor = 1.0 + (max(0, 9 - rank_h) + max(0, 9 - rank_a))/40.0
+    fill = (0.35 + allure * 0.6) * price_factor * rank_factor * u
+    return int(max(1200, min(cap, cap*fill)))
+
+
+def _with_same_draw(D, fn):
+    """match ストリームを巻き戻して、新旧で同じ uniform を使う"""
+    rng = D.rng("match")
+    state = rng.bit_generator.state
+    got = fn()
+    after = rng.bit_generator.state
+    rng.bit_generator.state = state
+    u = rng.uniform(0.9, 1.05)
+    assert rng.bit_generator.state == after
+    return got, u
+
+
+@pytest.mark.parametrize("weeks", [0, 5, 14])
+def test_default_league_matches_fixed_eight_formula(weeks):
+    D = engine.new_game(seed=7)
+    assert [len(cs) for cs in D["divisions"].values()] == [8, 8]
+    for _ in range(weeks):
+        engine.play_week(D)
+    clubs = D["club_list"]
+    for home in clubs:
+        for away in clubs:                       # 別ディビジョン（大陸大会）の相手も含む
+            if home == away:
+                continue
+            price = int(D["club_meta"][home]["ticket"] * 1.2)
+            got, u = _with_same_draw(D, lambda: engine.demand_attendance(D, home, away, price))
+            assert got == _old_attendance(D, home, away, price, u), (home, away)
+
+
+def test_rank_bonus_range_is_size_independent():
+    D = engine.new_game(engine.make_league_config(divisions=2, clubs_per_division=20), seed=1)
+    for _ in range(6):
+        engine.play_week(D)
+    div = engine.club_division(D, D["club_name"])
+    order = D["standings"][div].ordered_clubs()
+    n = len(order)
+    top, bottom = order[:2], order[-2:]
+    # 順位補正だけを取り出す（人気・価格・乱数は同じにする）
+    for c in top + bottom:
+        D["club_meta"][c].update(pop=10, ticket=30)          # 上限 30,000 人に届かない人気
+    def fill(h, a):
+        att, u = _with_same_draw(D, lambda: engine.demand_attendance(D, h, a, 30))
+        return att / u
+    ratio = fill(*top) / fill(*bottom)
+    # 1・2位同士 vs (n-1)・n位同士
+    assert ratio == pytest.approx((1 + (2*n - 1)/(5*n)) / (1 + 3/(5*n)), rel=1e-3)
@@ -0,0 +1,61 @@
+# _grow_table（列演算の週次成長）を、1人ずつ回していた旧ループと同じ乱数で突き合わせる
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+
+def _old_grow(rng, df, mult, sd, lo, hi):
+    """旧 apply_growth_weekly の iterrows ループ（OV / MV を書き換えたコピーを返す）"""
+    out = df.copy()
+    for idx, p in df.iterrows():
+        ov, pot, age, g = int(p["OV"]), int(p["POT"]), int(p["Age"]), p.get("Growth", "標準")
+        delta = engine._growth_delta(age, g, pot, ov) * mult
+        new_ov = int(max(lo, min(hi, ov + rng.normal(delta, sd))))
+        if new_ov != ov:
+            out.at[idx, "OV"] = new_ov
+            out.at[idx, "MV"] = engine.mv_from_ov_strict(new_ov)
+    return out
+
+
+def _edge_rows(df, rng):
+    """境界（OV 上限・下限付近、POT = OV、年齢がピーク前後）を混ぜる"""
+    n = len(df)
+    ov = rng.choice([25, 30, 31, 60, 94, 95, 98, 99], n)
+    return df.assign(
+        OV=ov.astype(df["OV"].dtype),
+        POT=np.minimum(99, ov + rng.choice([0, 1, 20], n)).astype(df["POT"].dtype),
+        Age=rng.choice([15, 17, 22, 25, 28, 33, 38], n).astype(df["Age"].dtype),
+        MV=engine.mv_from_ov_array(ov).astype(df["MV"].dtype),
+    )
+
+
+@pytest.mark.parametrize("mult, sd, lo, hi", [(1.0, 0.1, 30, 99), (1.1, 0.15, 25, 95), (1.0, 2.0, 30, 99)])
+@pytest.mark.parametrize("edges", [False, True])
+def test_grow_table_matches_scalar_loop(mult, sd, lo, hi, edges):
+    D = engine.new_game(seed=2)
+    df = D["players"]
+    if edges:
+        df = _edge_rows(df, np.random.default_rng(1))
+    rng_old, rng_new = np.random.default_rng(42), np.random.default_rng(42)
+    want = _old_grow(rng_old, df, mult, sd, lo, hi)
+    got = df.copy()
+    new_ov = engine._grow_table(rng_new, got, mult, sd, lo, hi)
+    np.testing.assert_array_equal(new_ov, want["OV"].to_numpy(dtype=np.int64))
+    np.testing.assert_array_equal(got["OV"].to_numpy(dtype=np.int64), want["OV"].to_numpy(dtype=np.int64))
+    np.testing.assert_array_equal(got["MV"].to_numpy(dtype=np.int64), want["MV"].to_numpy(dtype=np.int64))
+    assert got["OV"].dtype == df["OV"].dtype and got["MV"].dtype == df["MV"].dtype
+    # 乱数を同じ数だけ消費している（後続のストリームがずれない）
+    assert rng_old.random() == rng_new.random()
+
+
+def test_growth_delta_array_matches_scalar():
+    D = engine.new_game(seed=2)
+    df = _edge_rows(D["players"], np.random.default_rng(3))
+    want = [engine._growth_delta(int(r.Age), r.Growth, int(r.POT), int(r.OV)) for r in df.itertuples()]
+    np.testing.assert_allclose(engine._growth_delta_array(df), want, rtol=0, atol=1e-12)
+    # Growth 列が無い表は「標準」扱い
+    plain = df.drop(columns="Growth")
+    want = [engine._growth_delta(int(r.Age), "標準", int(r.POT), int(r.OV)) for r in plain.itertuples()]
+    np.testing.assert_allclose(engine._growth_delta_array(plain), want, rtol=0, atol=1e-12)
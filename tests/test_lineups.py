@@ -0,0 +1,88 @@
+# select_lineups（全クラブ一括）を、クラブごとに1人ずつ選んでいた旧ロジックと突き合わせる
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+
+def _old_select(D, club, paths):
+    """旧 select_lineup_respecting_rules（iterrows 版）。同点の順だけ stable（ロスター順）に固定
+
+    paths には外国籍枠で外した人数（cap）と HG の入れ替え人数（hg_swap）を数える。
+    """
+    engine.ensure_registration_rules(D)
+    pool = D.club_roster(club).copy()
+    if pool.empty:
+        return pool.index
+    rules = D["registration_rules"]
+    pool["isHG"] = pool.apply(lambda r: engine._is_homegrown_at_club(D, r), axis=1)
+    pool["isDomestic"] = pool["Nat"].apply(lambda n: engine._is_domestic(D, club, n))
+    pool["prio"] = np.where(pool["isHG"], 3, np.where(pool["isDomestic"], 2, 1)) + pool["OV"].astype(float)/200.0
+    pick = []
+    foreigners = 0
+    for _, r in pool.sort_values("prio", ascending=False, kind="stable").iterrows():
+        if len(pick) >= 11: break
+        is_foreign = not engine._is_domestic(D, club, r["Nat"])
+        if is_foreign and foreigners >= rules["max_foreigners"]:
+            paths["cap"] += 1
+            continue
+        pick.append(r.name)
+        foreigners += int(is_foreign)
+    sel = pool.loc[pick]
+    need = max(0, rules["min_homegrown"] - int(sel["isHG"].sum()))
+    if need > 0:
+        reserves = pool[~pool.index.isin(pick) & (pool["isHG"]==True)].index.tolist()
+        i=0
+        for idx in sel.sort_values("prio", kind="stable").index:
+            if i>=need or not reserves: break
+            if not sel.loc[idx,"isHG"]:
+                pick.remove(idx); pick.append(reserves.pop(0)); i+=1
+                paths["hg_swap"] += 1
+    return pd.Index(pick[:11])
+
+
+def _shuffle_world(D, rng):
+    """同点・外国籍過多・HG 不足が起きやすいように選手表を書き換える"""
+    pl = D["players"]
+    n = len(pl)
+    nations = sorted({m["nation"] for m in D["club_meta"].values()})
+    D["players"] = pl.assign(
+        OV=rng.choice([60, 61, 70], n).astype(pl["OV"].dtype),            # 同じ OV を大量に作る
+        Nat=pd.Categorical(rng.choice(nations, n), dtype=pl["Nat"].dtype),
+        HGYearsClub=np.where(rng.random(n) < 0.15, 3, 0).astype(pl["HGYearsClub"].dtype),
+    )
+    # HG はユーザークラブだけ効く。HG の外国籍選手を作り、外国籍枠で外れて入れ替えが起きるようにする
+    own = D.club_rows(D["club_name"])[:5]
+    home = D["club_meta"][D["club_name"]]["nation"]
+    D["players"].loc[own, "HGYearsClub"] = 3
+    D["players"].loc[own, "Nat"] = next(x for x in nations if x != home)
+    local = D.club_rows(D["club_name"])[5:12]                               # 入れ替えられる側（国内・非 HG）
+    D["players"].loc[local, "HGYearsClub"] = 0
+    D["players"].loc[local, "Nat"] = home
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_batch_selector_matches_old_loop(seed):
+    D = engine.new_game(seed=seed)
+    rng = np.random.default_rng(seed)
+    _shuffle_world(D, rng)
+    clubs = D["club_list"]
+    paths = {"cap": 0, "hg_swap": 0}
+    # HG の入れ替えは、外国籍枠で HG の外国籍選手が外れたときに起きる
+    for max_f, min_hg in [(0, 0), (1, 4), (2, 3), (5, 2), (3, 6), (11, 11)]:
+        D["registration_rules"] = {"max_foreigners": max_f, "min_homegrown": min_hg}
+        got = engine.select_lineups(D, clubs)
+        for club in clubs:
+            want = _old_select(D, club, paths)
+            assert sorted(got[club].tolist()) == sorted(want.tolist()), (club, max_f, min_hg)
+    # 外国籍枠と HG 入れ替えの両方の分岐を通っていること
+    assert paths["cap"] > 0 and paths["hg_swap"] > 0
+
+
+def test_single_club_wrapper_matches_batch():
+    D = engine.new_game(seed=0)
+    _shuffle_world(D, np.random.default_rng(0))
+    batch = engine.select_lineups(D, D["club_list"])
+    for club in D["club_list"]:
+        assert engine.select_lineup_respecting_rules(D, club).tolist() == batch[club].tolist()
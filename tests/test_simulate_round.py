@@ -0,0 +1,114 @@
+# simulate_round（週の全試合を一括）を、1試合ずつ進めていた旧 _simulate_match のモデルと突き合わせる
+import numpy as np
+import pytest
+
+import engine
+
+REPS = 400
+
+
+def _old_lambdas(D, home, away):
+    """旧 _simulate_match の (λホーム, λアウェイ)"""
+    ph = engine._team_plan(D, home, away); pa = engine._team_plan(D, away, home)
+    sh = engine._club_strength(D, home) * ph["atk"] / max(0.5, pa["dfn"])
+    sa = engine._club_strength(D, away) * pa["atk"] / max(0.5, ph["dfn"])
+    sh *= 1.03
+    return max(0.15, 1.10 + (sh - sa)/55.0), max(0.15, 1.10 + (sa - sh)/55.0)
+
+
+def _old_round(D, fixtures, rng, apps, goals, lineups):
+    """旧 _simulate_match を1試合ずつ（Apps/Goals は D ではなく配列に数える）"""
+    pl = D["players"]
+    out = []
+    for m in fixtures:
+        lam_h, lam_a = _old_lambdas(D, m["home"], m["away"])
+        gh, ga = rng.poisson(lam_h), rng.poisson(lam_a)
+        for club, g in ((m["home"], gh), (m["away"], ga)):
+            apps[pl.index.get_indexer(lineups[club])] += 1
+            squad = D.club_rows(club)
+            for _ in range(min(3, g)):
+                goals[pl.index.get_loc(squad[int(rng.integers(len(squad)))])] += 1
+        out.append((gh, ga))
+    return np.array(out)
+
+
+@pytest.fixture
+def world():
+    D = engine.new_game(seed=5)
+    fixtures = engine.week_fixtures(D, 1)
+    assert fixtures
+    return D, fixtures
+
+
+def test_fixture_lambdas_match_scalar_formula(world):
+    D, fixtures = world
+    got = engine.fixture_lambdas(D, [m["home"] for m in fixtures], [m["away"] for m in fixtures])
+    want = np.array([_old_lambdas(D, m["home"], m["away"]) for m in fixtures])
+    np.testing.assert_allclose(got, want, rtol=1e-12)
+
+
+def test_round_rates_match_per_match_model(world):
+    D, fixtures = world
+    pl = D["players"]
+    n = len(fixtures)
+    clubs = [c for m in fixtures for c in (m["home"], m["away"])]
+    lineups = {c: engine.select_lineup_respecting_rules(D, c) for c in clubs}   # Apps/Goals では変わらない
+
+    apps0 = pl["Apps"].to_numpy(dtype=np.int64).copy(); goals0 = pl["Goals"].to_numpy(dtype=np.int64).copy()
+    new_scores = np.array([[(r["gh"], r["ga"]) for r in engine.simulate_round(D, fixtures, gate=False)]
+                           for _ in range(REPS)])                                # (REPS, n, 2)
+    pl = D["players"]
+    new_apps = pl["Apps"].to_numpy(dtype=np.int64) - apps0
+    new_goals = pl["Goals"].to_numpy(dtype=np.int64) - goals0
+
+    rng = np.random.default_rng(0)
+    old_apps = np.zeros(len(pl), dtype=np.int64); old_goals = np.zeros(len(pl), dtype=np.int64)
+    old_scores = np.array([_old_round(D, fixtures, rng, old_apps, old_goals, lineups) for _ in range(REPS)])
+
+    # 出場：同じ先発が毎試合 1 ずつ（乱数に依らない）
+    np.testing.assert_array_equal(new_apps, old_apps)
+
+    # 得点：試合ごとの平均が λ の標本誤差内（新旧どちらも）
+    lam = np.array([_old_lambdas(D, m["home"], m["away"]) for m in fixtures])
+    se = np.sqrt(lam / REPS)
+    for scores in (new_scores, old_scores):
+        assert np.all(np.abs(scores.mean(axis=0) - lam) < 5 * se)
+    assert abs(new_scores.mean() - old_scores.mean()) < 5 * np.sqrt(2 * lam.mean() / (REPS * n))
+
+    # 得点者：各サイド min(3, 得点) 人ぶん記録される
+    assert new_goals.sum() == np.minimum(3, new_scores).sum()
+    assert old_goals.sum() == np.minimum(3, old_scores).sum()
+    per_match_new = new_goals.sum() / (REPS * n); per_match_old = old_goals.sum() / (REPS * n)
+    assert abs(per_match_new - per_match_old) < 0.1 * per_match_old
+
+    # 得点者はスカッド内で等確率（クラブごとの記録数に対するカイ二乗）
+    chi2 = dof = 0.0
+    for c in dict.fromkeys(clubs):
+        pos = pl.index.get_indexer(D.club_rows(c))
+        obs = new_goals[pos]
+        if obs.sum() == 0:
+            continue
+        exp = obs.sum() / len(pos)
+        chi2 += ((obs - exp)**2 / exp).sum(); dof += len(pos) - 1
+    assert chi2 < dof + 6 * np.sqrt(2 * dof)
+
+
+def test_gate_only_when_requested(world):
+    D, _ = world
+    home = engine.USER_CLUB
+    away = next(c for c in D["club_list"] if c != home)
+    n = len(D.get("finance_log", []))
+    engine.simulate_round(D, [{"home": home, "away": away}], gate=False)
+    assert len(D.get("finance_log", [])) == n
+    engine.simulate_round(D, [{"home": home, "away": away}])
+    assert D["finance_log"][-1]["memo"].startswith(f"Gate ({home} vs {away})")
+
+
+def test_counters_saturate_instead_of_wrapping(world):
+    D, fixtures = world
+    pl = D["players"]
+    top = np.iinfo(pl["Apps"].dtype).max
+    pl["Apps"] = np.full(len(pl), top, dtype=pl["Apps"].dtype)
+    engine.simulate_round(D, fixtures, gate=False)
+    assert D["players"]["Apps"].min() >= 0
+    assert D["players"]["Apps"].max() == top
@@ -0,0 +1,132 @@
+# 選手テーブルの追記バッファ・削除印（GameState._journal）を、毎回コピーする素朴な実装と突き合わせる
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+from state import PLAYER_TABLES
+
+
+class CopyRef:
+    """比較用：変更のたびに DataFrame を作り直す（旧来の copy-on-write と同じ振る舞い）"""
+
+    def __init__(self, D):
+        self.tables = {tb: dict.__getitem__(D, tb).copy() for tb in PLAYER_TABLES if tb in D}
+        self.next = {tb: (int(df.index.max()) + 1 if len(df) else 0) for tb, df in self.tables.items()}
+        self.roster = D.version("roster")
+
+    def append(self, D, table, rows):
+        df = rows if isinstance(rows, pd.DataFrame) else D.conform(pd.DataFrame(rows))
+        n = len(df)
+        df = D.conform(df).set_axis(pd.RangeIndex(self.next[table], self.next[table] + n))
+        self.next[table] += n
+        self.tables[table] = pd.concat([self.tables[table], df])
+        self.roster += table == "players"
+
+    def remove(self, table, pid):
+        df = self.tables[table]
+        hit = df.index[df["ID"].to_numpy() == pid]
+        if len(hit) == 0:
+            return None
+        row = df.loc[hit[0]]
+        self.tables[table] = df.drop(index=hit)
+        self.roster += table == "players"
+        return row
+
+    def locate(self, pid):
+        for tb, df in self.tables.items():
+            hit = df.index[df["ID"].to_numpy() == pid]
+            if len(hit):
+                return tb, hit[0]
+        return None
+
+
+def _assert_same(D, ref):
+    for tb, want in ref.tables.items():
+        got = D[tb]
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), want.reset_index(drop=True), check_dtype=False)
+        assert got.index.tolist() == want.index.tolist(), tb
+        assert got.index.is_unique, tb
+        for pid in want["ID"].astype(int):
+            assert D.locate_player(pid) == ref.locate(pid)
+    assert D.version("roster") == ref.roster
+    pl = ref.tables["players"]
+    for club in D["club_list"][:4]:
+        assert D.club_rows(club).tolist() == pl.index[pl["Club"].astype(object).to_numpy() == club].tolist()
+
+
+def _new_rows(D, rng, table, n):
+    clubs = D["club_list"][int(rng.integers(len(D["club_list"])))] if table == "players" else None
+    df = engine.generate_players(D, n, clubs)
+    if table == "academy":
+        df = df.assign(IsYouth=True)
+    return df
+
+
+@pytest.fixture
+def world():
+    D = engine.new_game(seed=3)
+    engine.youth_intake(D)
+    return D
+
+
+def test_interleaved_ops_match_copy_reference(world):
+    D = world
+    D["players"]; D["academy"]               # 初期化時の追記を反映してから基準を取る
+    ref = CopyRef(D)
+    rng = np.random.default_rng(11)
+    for step in range(400):
+        op = int(rng.integers(7))
+        tb = PLAYER_TABLES[int(rng.integers(len(PLAYER_TABLES)))]
+        if op == 0:                                # dict の行で追加
+            rows = _new_rows(D, rng, tb, int(rng.integers(1, 4))).to_dict("records")
+            D.append_players(tb, rows); ref.append(D, tb, rows)
+        elif op == 1:                              # DataFrame で追加
+            rows = _new_rows(D, rng, tb, int(rng.integers(1, 4)))
+            D.append_players(tb, rows); ref.append(D, tb, rows)
+        elif op in (2, 3):                         # 削除（最大ラベルの行を優先して、ラベルの再利用を突く）
+            df = ref.tables[tb]
+            if len(df) == 0:
+                continue
+            pid = int(df["ID"].iloc[-1] if op == 2 else df["ID"].iloc[int(rng.integers(len(df)))])
+            got, want = D.remove_player(tb, pid), ref.remove(tb, pid)
+            assert int(got["ID"]) == int(want["ID"]) == pid
+            assert D.remove_player(tb, pid) is None
+        elif op == 4:                              # 途中で読む（反映が走る）
+            _assert_same(D, ref)
+        elif op == 5:                              # 未反映のまま pickle 往復
+            D = pickle.loads(pickle.dumps(D))
+            _assert_same(D, ref)
+        else:                                      # 未反映のまま club_rows
+            pl = ref.tables["players"]
+            club = D["club_list"][0]
+            assert D.club_rows(club).tolist() == pl.index[pl["Club"].astype(object).to_numpy() == club].tolist()
+    _assert_same(D, ref)
+
+
+def test_bulk_accessors_see_pending_changes(world):
+    D = world
+    pid = int(D["players"]["ID"].iloc[-1])
+    D.remove_player("players", pid)
+    D.append_players("free_agents", _new_rows(D, np.random.default_rng(0), "free_agents", 2))
+    n_fa = len(D["free_agents"])                  # ここで一度反映
+    D.append_players("free_agents", _new_rows(D, np.random.default_rng(1), "free_agents", 1))
+    for view in (dict(D), D.copy(), dict(D.items())):
+        assert pid not in view["players"]["ID"].to_numpy()
+        assert len(view["free_agents"]) == n_fa + 1
+    assert len(dict(zip(D.keys(), D.values()))["free_agents"]) == n_fa + 1
+    assert len(D.pop("free_agents")) == n_fa + 1
+
+
+def test_labels_never_reused_after_max_row_removed(world):
+    D = world
+    fa = D["free_agents"]
+    top = int(fa.index.max())
+    D.remove_player("free_agents", int(fa.loc[top, "ID"]))
+    D["free_agents"]                               # 反映（最大ラベルの行が消える）
+    new = _new_rows(D, np.random.default_rng(0), "free_agents", 1)
+    D.append_players("free_agents", new)
+    assert int(D["free_agents"].index.max()) == top + 1
+    assert D.locate_player(int(new["ID"].iloc[0])) == ("free_agents", top + 1)
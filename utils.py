@@ -1,4 +1,4 @@
-import random
+import numpy as np
 
 # === ポジション別・総合評価 ===
 def calculate_total_score(player):
@@ -51,12 +51,13 @@ def get_flag_image(nationality: str) -> str:
     return flag_paths.get(nationality, "flags/default.png")
 
 # === 総当たりリーグスケジュール生成 ===
-def generate_league_schedule(teams: list) -> list:
+def generate_league_schedule(rng: np.random.Generator, teams: list) -> list:
+    """rng はゲーム状態の Generator（例: D.rng("world")）"""
     schedule = []
     for i in range(len(teams)):
         for j in range(i+1, len(teams)):
             schedule.append((teams[i], teams[j]))
-    random.shuffle(schedule)
+    rng.shuffle(schedule)
     return schedule
 
 # === ユース判定 ===
@@ -74,8 +75,8 @@ def estimate_salary(overall: int, nationality: str) -> int:
         return int(base)
 
 # === スカウト候補の自動生成（定期入れ替え） ===
-def generate_scout_candidates(period, last_update_period, n=6):
-    """n人のスカウト候補をperiod（例:3）ごとに自動生成"""
+def generate_scout_candidates(rng: np.random.Generator, period, last_update_period, n=6):
+    """n人のスカウト候補をperiod（例:3）ごとに自動生成（rng は D.rng("scouting") など）"""
     if period % 3 != 1 and period != last_update_period:
         return None  # まだ更新しない
 
@@ -83,21 +84,22 @@ def generate_scout_candidates(period, last_update_period, n=6):
     nationalities = ["ブラジル", "アルゼンチン", "日本", "ドイツ", "イングランド", "フランス", "スペイン", "イタリア"]
     candidates = []
     for _ in range(n):
-        name = random.choice(names)
-        nationality = random.choice(nationalities)
-        age = random.randint(17, 22)
+        name = names[int(rng.integers(len(names)))]
+        nationality = nationalities[int(rng.integers(len(nationalities)))]
+        age = int(rng.integers(17, 23))
         stats = {
-            "スピード": random.randint(50, 85),
-            "パス": random.randint(50, 85),
-            "フィジカル": random.randint(50, 85),
-            "スタミナ": random.randint(50, 85),
-            "ディフェンス": random.randint(50, 85),
-            "テクニック": random.randint(50, 85),
-            "メンタル": random.randint(50, 85),
-            "シュート": random.randint(50, 85),
-            "パワー": random.randint(50, 85),
+            "スピード": int(rng.integers(50, 86)),
+            "パス": int(rng.integers(50, 86)),
+            "フィジカル": int(rng.integers(50, 86)),
+            "スタミナ": int(rng.integers(50, 86)),
+            "ディフェンス": int(rng.integers(50, 86)),
+            "テクニック": int(rng.integers(50, 86)),
+            "メンタル": int(rng.integers(50, 86)),
+            "シュート": int(rng.integers(50, 86)),
+            "パワー": int(rng.integers(50, 86)),
         }
-        pos = random.choice(["GK", "DF", "MF", "FW"])
+        positions = ["GK", "DF", "MF", "FW"]
+        pos = positions[int(rng.integers(len(positions)))]
         candidate = {
             "名前": name,
             "国籍": nationality,
@@ -0,0 +1,80 @@
+# worker.py — バックグラウンドでの週進行（UI スレッドを止めない早送り）
+# ------------------------------------------------------------
+# SimWorker はゲーム状態のスナップショットを丸ごと所有し、別スレッドで play_weeks を回す。
+# UI は poll() で進捗（週・シーズン・経過秒）を受け取り、終わったら result() を
+# st.session_state.data に1回で差し替える。実行中の元の状態には一切触らない。
+
+import pickle
+import queue
+import threading
+import time
+from typing import Optional
+
+from engine import play_weeks
+from state import GameState
+
+
+def snapshot(D:GameState) -> GameState:
+    """ゲーム状態の完全なコピー（pickle 往復。deepcopy より速い）"""
+    return pickle.loads(pickle.dumps(D, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class SimWorker:
+    """n 週分の play_week をバックグラウンドスレッドで進める
+
+    status: "running" → "done" / "cancelled" / "error"
+    中止した場合、それまでに進めた分も含めて結果は捨てる（元の状態のまま）。
+    """
+
+    def __init__(self, D:GameState, n:int):
+        self.total = int(n)
+        self.status = "running"
+        self.error: Optional[BaseException] = None
+        self._state = snapshot(D)
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._last = {"done": 0, "total": self.total, "season": D["season"], "week": D["week"], "elapsed": 0.0}
+        self._thread = threading.Thread(target=self._run, name="sim-worker", daemon=True)
+
+    def start(self) -> "SimWorker":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        S = self._state
+        t0 = time.perf_counter()
+        def on_week(i:int, n:int) -> bool:
+            self._queue.put({"done": i, "total": n, "season": S["season"], "week": S["week"],
+                             "elapsed": time.perf_counter() - t0})
+            return not self._cancel.is_set()
+        try:
+            done = play_weeks(S, self.total, on_week)
+            self.status = "done" if done == self.total else "cancelled"
+        except BaseException as e:          # UI 側で表示する
+            self.error = e
+            self.status = "error"
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def poll(self) -> dict:
+        """溜まった進捗を読み捨てて最新の1件を返す"""
+        while True:
+            try:
+                self._last = self._queue.get_nowait()
+            except queue.Empty:
+                return self._last
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout:Optional[float]=None) -> str:
+        self._thread.join(timeout)
+        return self.status
+
+    def result(self) -> GameState:
+        """完了した状態（done のときだけ）"""
+        if self.status != "done":
+            raise RuntimeError(f"simulation is {self.status}")
+        return self._state